@@ -2,9 +2,15 @@ import sys
 
 import pygame
 
-from lib.constants import RESOLUTION, SCALING_FACTOR
-from lib.utils import load_image, load_images
-from lib.tilemap import Tilemap
+from lib.analyzer import analyze_grid
+from lib.camera import Camera
+from lib.constants import PARALLAX_LAYERS, RESOLUTION, SCALING_FACTOR
+from lib.fileio import FileIO, IOJob
+from lib.minimap import Minimap
+from lib.parallax import ParallaxBackground
+from lib.utils import load_images
+from lib.renderer import RenderQueue
+from lib.tilemap import TILE_TYPES, Tilemap
 
 RENDER_SCALE = 2.0
 FILE_PATH = "data/maps/level1.json"
@@ -13,6 +19,8 @@ NON_RENDER_TILES = {
     "player_spawner",
     "skeleton_path_mirror",
     "player_player_collision_detector",
+    "level_exit",
+    "checkpoint",
 }
 
 
@@ -51,18 +59,23 @@ class Editor:
             "skeleton_spawner": load_images("entities/skeleton/idle/"),
             "skeleton_path_mirror": pygame.Surface((10, 10)),
             "player_collision_detector": pygame.Surface((10, 10)),
+            "level_exit": pygame.Surface((10, 10)),
+            "checkpoint": pygame.Surface((10, 10)),
         }
 
         self.movement = [False, False, False, False]
 
         self.tilemap = Tilemap(self, tile_size=32)
+        self.render_queue = RenderQueue()
+        self.minimap = Minimap(self.tilemap)
+        self.show_minimap = True
 
-        try:
-            self.tilemap.load(FILE_PATH)
-        except FileNotFoundError:
-            pass
+        self.io = FileIO()
+        self.loading = True
+        self.io.load(FILE_PATH, self.loaded)
 
-        self.scroll = [0, 0]
+        self.camera = Camera(self.display.get_size(), tile_size=self.tilemap.tile_size)
+        self.background = ParallaxBackground(PARALLAX_LAYERS, self.display.get_size())
 
         self.tile_list = list(self.assets)
         self.tile_group = 0
@@ -74,22 +87,37 @@ class Editor:
         self.ongrid = True
         self.fast = False
 
+        self.analysis = None
+
+    def loaded(self, job):
+        try:
+            self.tilemap.load_grid(job.result())
+        except FileNotFoundError:
+            pass
+        self.minimap.rebuild()
+        self.loading = False
+
+    def saved(self, job):
+        job.result()
+
+    def analyzed(self, job):
+        self.analysis = job.result()
+        for warning in self.analysis.warnings:
+            print(warning)
+
     def run(self):
         while True:
-            self.display.blit(
-                pygame.transform.scale_by(load_image("background.png"), 1),
-                (0, 0),
-            )
+            self.io.poll()
 
-            self.scroll[0] += (self.movement[1] - self.movement[0]) * (
-                2 if not self.fast else 6
+            speed = 2 if not self.fast else 6
+            self.camera.move(
+                (self.movement[1] - self.movement[0]) * speed,
+                (self.movement[3] - self.movement[2]) * speed,
             )
-            self.scroll[1] += (self.movement[3] - self.movement[2]) * (
-                2 if not self.fast else 6
-            )
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
 
-            self.tilemap.render(self.display, offset=render_scroll)
+            self.background.render(self.render_queue, self.camera)
+            self.tilemap.render(self.render_queue, self.camera)
+            self.render_queue.flush(self.display, self.camera.offset)
 
             try:
                 current_tile_img = self.assets[self.tile_list[self.tile_group]][
@@ -101,46 +129,42 @@ class Editor:
 
             mpos = pygame.mouse.get_pos()
             mpos = (mpos[0] / RENDER_SCALE, mpos[1] / RENDER_SCALE)
-            tile_pos = (
-                int((mpos[0] + self.scroll[0]) // self.tilemap.tile_size),
-                int((mpos[1] + self.scroll[1]) // self.tilemap.tile_size),
-            )
+            tile_pos = self.camera.cell_at(mpos)
 
             if self.ongrid:
                 self.display.blit(
                     current_tile_img,
-                    (
-                        tile_pos[0] * self.tilemap.tile_size - self.scroll[0],
-                        tile_pos[1] * self.tilemap.tile_size - self.scroll[1],
+                    self.camera.to_screen(
+                        (
+                            tile_pos[0] * self.tilemap.tile_size,
+                            tile_pos[1] * self.tilemap.tile_size,
+                        )
                     ),
                 )
             else:
                 self.display.blit(current_tile_img, mpos)
 
-            if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ";" + str(tile_pos[1])] = {
-                    "type": self.tile_list[self.tile_group],
-                    "variant": self.tile_variant,
-                    "pos": tile_pos,
-                }
-
-            if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ";" + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
+            if self.clicking and self.ongrid and not self.loading:
+                tile = (self.tile_list[self.tile_group], self.tile_variant)
+                if self.tilemap.tile_at(*tile_pos) != tile:
+                    self.tilemap.set_tile(tile_pos[0], tile_pos[1], *tile)
+                    self.minimap.update_cell(*tile_pos)
+
+            if self.right_clicking and not self.loading:
+                if self.tilemap.tile_at(*tile_pos) is not None:
+                    self.tilemap.remove_tile(*tile_pos)
+                    self.minimap.update_cell(*tile_pos)
                 for tile in self.tilemap.offgrid_tiles.copy():
-                    if tile["type"] not in NON_RENDER_TILES:
-                        tile_img = self.assets[tile["type"]][tile["variant"]]
+                    tile_type, variant, x, y = tile
+                    if TILE_TYPES[tile_type] not in NON_RENDER_TILES:
+                        tile_img = self.assets[TILE_TYPES[tile_type]][variant]
                     else:
                         tile_img = pygame.Surface((0, 0))
                     tile_r = pygame.Rect(
-                        tile["pos"][0] - self.scroll[0],
-                        tile["pos"][1] - self.scroll[1],
-                        tile_img.get_width(),
-                        tile_img.get_height(),
+                        self.camera.to_screen((x, y)), tile_img.get_size()
                     )
                     if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                        self.tilemap.remove_offgrid(tile)
 
             self.display.blit(current_tile_img, (5, 5))
             type_text = self.font.render(
@@ -151,6 +175,24 @@ class Editor:
             )
             self.display.blit(variant_text, (40, 5))
             self.display.blit(type_text, (40, 25))
+            if self.analysis is not None:
+                analysis_text = self.font.render(
+                    f"{len(self.analysis.warnings)} warnings,"
+                    f" {sum(self.analysis.reachable)} reachable cells"
+                    f" ({self.analysis.time * 1000:.0f}ms)",
+                    False,
+                    (255, 255, 255) if not self.analysis.warnings else (255, 120, 120),
+                )
+                self.display.blit(analysis_text, (40, 45))
+            if self.show_minimap:
+                self.minimap.draw(self.display, self.camera)
+            for job in self.io.jobs:
+                io_text = self.font.render(
+                    f"{job.kind.capitalize()} {job.path} {job.progress:.0%}",
+                    False,
+                    (255, 255, 255),
+                )
+                self.display.blit(io_text, (40, 65))
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
@@ -158,18 +200,19 @@ class Editor:
                     sys.exit()
 
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1:
+                    if (
+                        event.button == 1
+                        and self.show_minimap
+                        and self.minimap.rect.collidepoint(mpos)
+                    ):
+                        self.camera.center_on(self.minimap.world_at(mpos))
+                    elif event.button == 1:
                         self.clicking = True
-                        if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append(
-                                {
-                                    "type": self.tile_list[self.tile_group],
-                                    "variant": self.tile_variant,
-                                    "pos": (
-                                        mpos[0] + self.scroll[0],
-                                        mpos[1] + self.scroll[1],
-                                    ),
-                                }
+                        if not self.ongrid and not self.loading:
+                            self.tilemap.add_offgrid(
+                                self.tile_list[self.tile_group],
+                                self.tile_variant,
+                                self.camera.to_world(mpos),
                             )
                     if event.button == 3:
                         self.right_clicking = True
@@ -210,8 +253,18 @@ class Editor:
                         self.movement[3] = True
                     if event.key == pygame.K_g:
                         self.ongrid = not self.ongrid
-                    if event.key == pygame.K_o:
-                        self.tilemap.save(FILE_PATH)
+                    if event.key == pygame.K_m:
+                        self.show_minimap = not self.show_minimap
+                    if event.key == pygame.K_o and not self.loading:
+                        # the worker runs jobs in order, so the analysis of
+                        # the saved grid starts once it is written
+                        grid = self.tilemap.grid()
+                        self.io.save(FILE_PATH, grid, self.saved)
+                        self.io.submit(
+                            IOJob("analyzing", FILE_PATH, self.analyzed),
+                            analyze_grid,
+                            grid,
+                        )
                     if event.key == pygame.K_LSHIFT:
                         self.shift = True
                     if event.key == pygame.K_LALT:
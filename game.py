@@ -1,90 +1,90 @@
 from math import exp
 import sys
+import threading
+
+from lib.startup import Startup, StartupTrace
 
 import pygame
 
 from lib.popup import PopupDialog
-from lib.utils import clamp, load_image, load_images, Animation
-from lib.entities import Player, Skeleton
-from lib.tilemap import Tilemap
+from lib.animation import Clip
+from lib.camera import Camera
+from lib.utils import load_images
+from lib.entities import Player
+from lib.hotreload import HotReloader
+from lib.levels import Level, LevelManager
+from lib.minimap import Minimap
+from lib.navigation import FlowField, NavGraph
+from lib.parallax import ParallaxBackground
+from lib.particles import ParticleSystem, load_numpy
+from lib.renderer import RenderQueue
+from lib import renderer
+from lib.simulation import CLIP_ASSETS, World
+from lib.tilemap import TileGrid, Tilemap
 import lib.constants as constants
 
-
-class Game:
-    def __init__(self):
-        pygame.init()
-
+TILE_ASSETS = {
+    "floor": "tiles/blocks/floor",
+    "large_floor": "tiles/blocks/large_floor",
+    "rocks": "tiles/blocks/rocks",
+    "wall": "tiles/blocks/wall",
+    "wall_with_pillar": "tiles/blocks/wall_with_pillar",
+    "pillar1": "tiles/pillars/pillar1",
+    "pillar2": "tiles/pillars/pillar1",
+    "pillar_broken": "tiles/pillars/broken",
+    "open_gate": "tiles/gates/open",
+    "closed_gate": "tiles/gates/closed",
+    "decorations": "tiles/decorations",
+    "half_floor": "tiles/blocks/half_floor",
+}
+
+
+class Game(World):
+    def __init__(self, staged=False, trace=None):
+        self.trace = trace if trace is not None else StartupTrace()
+        super().__init__({}, ParticleSystem(), LevelManager(constants.LEVELS))
+        # the first level is read on the loader thread while the window and
+        # the loading frames come up
+        self.levels.preload(0)
+
+        # only what the first frame needs is set up here, the rest is queued
+        # as startup stages that run between frames
+        pygame.display.init()
         pygame.display.set_caption("ninja game")
         self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-        self.display = pygame.Surface(
-            (
-                constants.RESOLUTION[0] / constants.SCALING_FACTOR,
-                constants.RESOLUTION[1] / constants.SCALING_FACTOR,
-            )
-        )
+        self.display = pygame.Surface(self.view_size)
         self.clock = pygame.time.Clock()
+        self.trace.mark("display")
 
-        self.movement = [False, False]
-
-        self.assets = {
-            "floor": load_images("tiles/blocks/floor"),
-            "large_floor": load_images("tiles/blocks/large_floor"),
-            "rocks": load_images("tiles/blocks/rocks"),
-            "wall": load_images("tiles/blocks/wall"),
-            "wall_with_pillar": load_images("tiles/blocks/wall_with_pillar"),
-            "background": load_image("background.png"),
-            "pillar1": load_images("tiles/pillars/pillar1"),
-            "pillar2": load_images("tiles/pillars/pillar1"),
-            "pillar_broken": load_images("tiles/pillars/broken"),
-            "open_gate": load_images("tiles/gates/open"),
-            "closed_gate": load_images("tiles/gates/closed"),
-            "decorations": load_images("tiles/decorations"),
-            "half_floor": load_images("tiles/blocks/half_floor"),
-            "hearts": load_images("assets/hearts"),
-            "player/idle": Animation(load_images("entities/player/idle")),
-            "player/run": Animation(load_images("entities/player/run")),
-            "player/turn_around": Animation(load_images("entities/player/turn_around")),
-            "player/jump": Animation(load_images("entities/player/jump")),
-            "player/death": Animation(load_images("entities/player/death")),
-            "player/fall": Animation(load_images("entities/player/fall")),
-            "player/attack": Animation(load_images("entities/player/attack")),
-            "player/attack_nomovement": Animation(
-                load_images("entities/player/attack_nomovement")
-            ),
-            "skeleton/attack": Animation(load_images("entities/skeleton/attack")),
-            "skeleton/death": Animation(load_images("entities/skeleton/death")),
-            "skeleton/hit": Animation(load_images("entities/skeleton/hit")),
-            "skeleton/idle": Animation(load_images("entities/skeleton/idle")),
-            "skeleton/walk": Animation(load_images("entities/skeleton/walk")),
-        }
-
-        self.player = Player(self, (2000, 150), (15, 30))
-
-        self.skeletons = []
-        self.player_collision_detectors = []
+        self.render_queue = RenderQueue()
+        self.hud_queue = RenderQueue()
+        self.debug_font = None
+        self.camera = Camera(
+            self.display.get_size(), smoothing=constants.CAMERA_SMOOTHING
+        )
+        self.background = ParallaxBackground(
+            constants.PARALLAX_LAYERS, self.display.get_size()
+        )
+        self.trace.mark("background")
 
         self.tilemap = Tilemap(self, tile_size=32)
+        self.navigation = NavGraph(self.tilemap)
+        self.flow_field = FlowField(self.navigation)
+        self.minimap = Minimap(self.tilemap)
+        self.show_overview = False
 
-        try:
-            self.tilemap.load("data/maps/level1.json")
-        except FileNotFoundError:
-            pass
-
-        self.setup()
-
-        self.scroll = [0, 0]
-        self.heart_grow_animation_time = 0
+        self.hot_reload = HotReloader(self)
 
         self.popups = [
             PopupDialog(
                 self,
                 "JUMPING",
-                "Uh oh. Looks like the player is too weak to jump up that block. Try changing the JUMP_STRENGTH variable in lib/constants.py\n\n\nDont forget to relaunch the app after making changes\nPress Enter to continue",
+                "Uh oh. Looks like the player is too weak to jump up that block. Try changing the JUMP_STRENGTH variable in lib/constants.py\n\n\nChanges are picked up as soon as you save the file\nPress Enter to continue",
             ),
             PopupDialog(
                 self,
                 "SPRINT",
-                "Uh oh. Looks like the player can't sprint to get past that gap. Search for the part which handles input in game.py and look for the L_SHIFT key. Fix any errors that you find\n\n\nPress Enter to continue",
+                "Uh oh. Looks like the player can't sprint to get past that gap. Search for the part which handles input in lib/simulation.py and look for the L_SHIFT key. Fix any errors that you find\n\n\nPress Enter to continue",
             ),
             PopupDialog(
                 self,
@@ -94,154 +94,223 @@ class Game:
             PopupDialog(
                 self,
                 "ATTACK",
-                "Uh oh. Looks like the player can't attack the skeletons. Search for the part which handles mouse input in game.py. Fix any errors that you find\n\n\nPress Enter to continue",
+                "Uh oh. Looks like the player can't attack the skeletons. Search for the part which handles mouse input in lib/simulation.py. Fix any errors that you find\n\n\nPress Enter to continue",
             ),
         ]
 
-        self.popup_index = -1
-
-    def setup(self):
-        self.player.pos = self.player.respawn_pos.copy()
-        self.player.dead = False
-        self.player.health = 60
-        self.player.time_since_death = 0
-        self.skeletons.clear()
-        for tile in self.tilemap.offgrid_tiles:
-            if tile["type"] == "player_spawner":
-                self.player.pos = tile["pos"].copy()
-                self.player.respawn_pos = tile["pos"].copy()
-            elif tile["type"] == "skeleton_spawner":
-                self.skeletons.append(Skeleton(self, tile["pos"], (15, 30)))
-            elif tile["type"] == "player_collision_detector":
-                self.player_collision_detectors.append(tile)
+        self.ready = False
+
+        self.startup = Startup(self.trace)
+        self.startup.add("level", self.read_first_level)
+        self.startup.add("visible tiles", self.load_visible_tiles)
+        self.startup.add("player", self.load_player)
+        self.startup.add("skeletons", lambda: self.load_clips("skeleton/"))
+        self.startup.add("start level", self.start_first_level)
+        self.startup.add("remaining tiles", self.load_remaining_tiles)
+        self.startup.add("pygame modules", pygame.init)
+        for popup in self.popups:
+            self.startup.add("popup " + popup.title.lower(), popup.get_popup)
+        self.startup.add("particles", self.particles.allocate)
+        if staged:
+            # numpy is the slowest import by far, so it happens on a thread
+            # while the loading frames are drawn
+            threading.Thread(target=load_numpy, daemon=True).start()
+        else:
+            self.startup.finish()
+
+    def load_assets(self, paths, make=None):
+        for name, path in paths.items():
+            if name not in self.assets:
+                images = load_images(path)
+                self.assets[name] = make(images) if make else images
+        self.tilemap.reset_images()
+        self.minimap.rebuild()
+
+    def read_first_level(self):
+        future = self.levels.loading.get(self.levels.paths[0])
+        if future is not None and not future.done():
+            return False
+        try:
+            self.first_level = self.levels.load(0)
+        except FileNotFoundError:
+            self.first_level = Level(None, TileGrid())
+        self.tilemap.load_grid(self.first_level.grid)
+        self.camera.fit(self.tilemap)
+        spawners = self.first_level.spawners["player_spawner"]
+        if spawners:
+            self.camera.center_on(spawners[-1]["pos"])
+
+    def load_visible_tiles(self):
+        visible = set()
+        for x in self.camera.columns:
+            for y in self.camera.rows:
+                tile = self.tilemap.tile_at(x, y)
+                if tile is not None:
+                    visible.add(tile[0])
+        self.load_assets(
+            {name: TILE_ASSETS[name] for name in visible & TILE_ASSETS.keys()}
+        )
 
-    def run(self):
-        while True:
-            self.display.blit(
-                pygame.transform.scale_by(self.assets["background"], 1),
-                (0, 0),
-            )
+    def load_clips(self, prefix):
+        self.load_assets(
+            {
+                name: path
+                for name, path in CLIP_ASSETS.items()
+                if name.startswith(prefix)
+            },
+            Clip,
+        )
 
-            self.scroll[0] += (
-                self.player.rect().centerx
-                - self.display.get_width() / 2
-                - self.scroll[0]
-            ) / 30
-            self.scroll[1] += (
-                self.player.rect().centery
-                - self.display.get_height() / 2
-                - self.scroll[1]
-            ) / 30
-
-            self.scroll[0] = clamp(
-                self.scroll[0],
-                constants.HORIZONTAL_SCROLL_LIMIT["min"],
-                constants.HORIZONTAL_SCROLL_LIMIT["max"],
-            )
-            self.scroll[1] = clamp(
-                self.scroll[1],
-                constants.VERTICAL_SCROLL_LIMIT["min"],
-                constants.VERTICAL_SCROLL_LIMIT["max"],
-            )
+    def load_player(self):
+        self.load_assets({"hearts": "assets/hearts"})
+        self.heart_images = [
+            pygame.transform.scale_by(img, 5) for img in self.assets["hearts"]
+        ]
+        self.load_clips("player/")
+        self.player = Player(self, (2000, 150), (15, 30))
 
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            self.tilemap.render(self.display, offset=render_scroll)
-
-            self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-            self.player.render(self.display, offset=render_scroll)
-
-            for i in range(len(self.skeletons) - 1, -1, -1):
-                skeleton = self.skeletons[i]
-                skeleton.update(self.tilemap)
-                if skeleton.time_since_death >= 15 * 5 - 2:
-                    self.skeletons.pop(i)
-                skeleton.render(self.display, offset=render_scroll)
-
-            """Handle Input"""
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if self.popup_index == -1:
-                    if event.type == pygame.KEYDOWN:
-                        if not self.player.dead:
-                            if event.key == pygame.K_a:
-                                self.movement[0] = True
-                            if event.key == pygame.K_d:
-                                self.movement[1] = True
-
-                        if event.key == pygame.K_w or event.key == pygame.K_SPACE:
-                            if self.player.air_time < 5:
-                                self.player.velocity[1] = -constants.JUMP_STRENGTH * (
-                                    1
-                                    if not self.player.sprinting
-                                    else constants.SPRINT_JUMP_HEIGHT_MULTIPLIER
-                                )
-
-                        if event.key == pygame.K_LSHIFT:
-                            if self.player.air_time < 5:
-                                self.player.sprinting = False
-
-                    if event.type == pygame.KEYUP:
-                        if event.key == pygame.K_a:
-                            self.movement[0] = False
-                        if event.key == pygame.K_d:
-                            self.movement[1] = False
-                        if event.key == pygame.K_LSHIFT:
-                            self.player.sprinting = False
-
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        if event.button == 1 and self.player.attack_cooldown == 0:
-                            self.player.attack_cooldown = constants.ATTACK_COOLDOWN * 60
-                            self.player.set_action("jump")
-
-                            if self.player.pos[0] > 2330 and (
-                                self.player.action != "attack"
-                                and self.player.action != "attack_nomovement"
-                            ):
-                                print(self.player.action)
-                                self.popup_index = 3
-                            # else:
-                            #     self.player.set_action("attack_nomovement")
-                else:
-                    self.movement = [0, 0]
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_RETURN:
-                            self.player.has_hit_collider = False
-                            self.player.time_since_collision = 0
-                            self.popup_index = -1
-            if self.player.dead and (
-                self.player.time_since_death >= 10 * 5
-                or self.player.pos[1] > self.display.get_size()[1]
-            ):
-                self.setup()
-
-            self.screen.blit(
-                pygame.transform.scale(self.display, self.screen.get_size()), (0, 0)
-            )
+    def start_first_level(self):
+        self.start_level(self.first_level)
+        self.ready = True
+
+    def load_remaining_tiles(self):
+        self.load_assets(TILE_ASSETS)
+
+    def load_map(self, level):
+        self.tilemap.load_grid(level.grid)
+        self.navigation.build()
+        self.flow_field.reset()
+        self.camera.fit(self.tilemap)
+        self.minimap.rebuild()
+
+    def reload_level(self, level):
+        # applies an edited copy of the current level, the player and any
+        # skeletons whose spawners didn't move carry on where they were
+        previous = self.level
+        self.level = level
+        if self.tilemap.update_grid(level.grid):
+            self.navigation.build()
+            self.flow_field.reset()
+            self.camera.fit(self.tilemap)
+            self.minimap.rebuild()
+        self.load_triggers(level)
+        if level.spawners["skeleton_spawner"] != previous.spawners["skeleton_spawner"]:
+            self.spawn_skeletons(level)
+            self.skeletons[:] = self.skeleton_pool
+            for snapshot in {self.level_start, self.checkpoint}:
+                snapshot.replace_skeletons(self.skeleton_pool)
 
-            scale_factor = 1
-            if self.heart_grow_animation_time > 0:
-                scale_factor = 1 + exp(
-                    -((self.heart_grow_animation_time - 50) ** 2) / 20
-                )
-                self.heart_grow_animation_time -= 1
+    def run(self):
+        first_frame = True
+        playable = False
+        while True:
+            if self.ready:
+                self.hot_reload.poll()
+                self.step(pygame.event.get())
+                self.render()
+            else:
+                self.render_loading()
+            pygame.display.update()
+
+            if first_frame:
+                first_frame = False
+                self.trace.mark("first frame")
+                self.trace.check("first frame")
+            if self.ready and not playable:
+                playable = True
+                self.trace.mark("first playable frame")
+            if not self.startup.done:
+                self.startup.advance(constants.STARTUP_FRAME_BUDGET)
+                if self.startup.done:
+                    self.trace.mark("startup complete")
+            self.clock.tick(60)
 
+    def render_loading(self):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+        self.background.render(self.render_queue, self.camera)
+        self.render_queue.flush(self.display)
+        width, height = self.display.get_size()
+        pygame.draw.rect(
+            self.display,
+            (200, 200, 200),
+            (width // 4, height - 30, width // 2 * self.startup.progress, 4),
+        )
+        pygame.transform.scale(self.display, self.screen.get_size(), self.screen)
+
+    def load_debug_font(self):
+        # created on first use, SHOW_DRAW_CALLS can be switched on by a reload
+        if self.debug_font is None:
+            pygame.font.init()
+            self.debug_font = pygame.font.SysFont("Ubuntu Mono", 20)
+        return self.debug_font
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            sys.exit()
+        if self.popup_index == -1 and event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_m:
+                self.show_overview = not self.show_overview
+        popup_index = self.popup_index
+        super().handle_event(event)
+        if self.popup_index == 3 and popup_index != 3:
+            print(self.player.action)
+
+    def render(self):
+        queue = self.render_queue
+        camera = self.camera
+        camera.follow(self.player.rect().center)
+
+        self.background.render(queue, camera)
+        self.tilemap.render(queue, camera)
+        self.player.render(queue)
+        for skeleton in self.skeletons:
+            skeleton.render(queue)
+        self.particles.render(queue, camera)
+        queue.flush(self.display, camera.offset)
+        if self.show_overview:
+            self.minimap.draw(self.display, camera, self.player.rect().center)
+
+        pygame.transform.scale(self.display, self.screen.get_size(), self.screen)
+
+        hud = self.hud_queue
+        if self.heart_grow_animation_time > 0:
+            scale_factor = 1 + exp(-((self.heart_grow_animation_time - 50) ** 2) / 20)
+            self.heart_grow_animation_time -= 1
             heart_img = pygame.transform.scale_by(
                 self.assets["hearts"][self.player.health // 10], 5 * scale_factor
             )
+        else:
+            heart_img = self.heart_images[self.player.health // 10]
+        hud.submit(
+            renderer.HUD,
+            heart_img,
+            (50, self.screen.get_height() - 40 - heart_img.height),
+        )
 
-            self.screen.blit(
-                heart_img,
-                (50, self.screen.get_height() - 40 - heart_img.height),
+        if self.popup_index != -1:
+            hud.submit(
+                renderer.POPUPS, self.popups[self.popup_index].get_popup(), (0, 0)
             )
 
-            if self.popup_index != -1:
-                self.screen.blit(self.popups[self.popup_index].get_popup(), (0, 0))
-            pygame.display.update()
-            self.clock.tick(60)
+        if constants.SHOW_DRAW_CALLS:
+            text = self.load_debug_font().render(
+                f"{queue.draw_calls + hud.draw_calls} draw calls,"
+                f" {queue.submitted + hud.submitted} sprites,"
+                f" {self.clock.get_fps():.0f} fps",
+                True,
+                (255, 255, 255),
+            )
+            hud.submit(renderer.HUD, text, (10, 10))
+
+        hud.flush(self.screen)
 
 
 if __name__ == "__main__":
-    Game().run()
+    trace = StartupTrace(
+        "--startup-trace" in sys.argv, budget=constants.FIRST_FRAME_BUDGET
+    )
+    Game(staged=True, trace=trace).run()
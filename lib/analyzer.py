@@ -0,0 +1,302 @@
+import math
+import sys
+import time
+from collections import deque
+
+from lib import constants, fileio
+from lib import tilemap as tiles
+from lib.tilemap import Tilemap
+
+EMPTY = 0
+SOLID = 1
+HALF = 2
+
+PLAYER_SIZE = (15, 30)
+MAX_ARC_FRAMES = 240
+MAX_GAP_CELLS = 12
+
+
+class SolidGrid:
+    def __init__(self, tilemap):
+        self.tile_size = tilemap.tile_size
+        bounds = tilemap.bounds() or (0, 0, 0, 0)
+        self.x0, self.y0 = bounds[0], bounds[1]
+        self.width = bounds[2] - self.x0 + 1
+        self.height = bounds[3] - self.y0 + 1
+        self.cells = bytearray(self.width * self.height)
+        if tilemap.width:
+            # tile ids map straight to cell kinds, so each row is one translate
+            kinds = bytes(
+                HALF if half else SOLID if solid else EMPTY
+                for solid, half in zip(
+                    tiles.SOLID.ljust(256, b"\0"), tiles.HALF.ljust(256, b"\0")
+                )
+            )
+            for row in range(self.height):
+                start = tilemap.index(self.x0, self.y0 + row)
+                self.cells[row * self.width : (row + 1) * self.width] = tilemap.types[
+                    start : start + self.width
+                ].translate(kinds)
+
+    def index(self, x, y):
+        return (y - self.y0) * self.width + (x - self.x0)
+
+    def inside(self, x, y):
+        return (
+            self.x0 <= x < self.x0 + self.width and self.y0 <= y < self.y0 + self.height
+        )
+
+    def solid(self, x, y):
+        x = int(x) - self.x0
+        y = int(y) - self.y0
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.cells[y * self.width + x] != EMPTY
+        return False
+
+    def standable(self, x, y):
+        return not self.solid(x, y) and self.solid(x, y + 1)
+
+    def cell_at(self, pos):
+        return (
+            math.floor(pos[0] / self.tile_size),
+            math.floor(pos[1] / self.tile_size),
+        )
+
+
+def player_arc(tile_size, direction, sprint, jump, overhang):
+    # horizontal positions per frame of the leading edge of a player leaving a
+    # cell, as Player.update moves it, plus the starting vertical velocity
+    x = overhang if direction > 0 else -overhang
+    if direction > 0:
+        x += tile_size - 1
+    xs = []
+    for air_time in range(1, MAX_ARC_FRAMES):
+        speed = 1
+        if sprint:
+            drag = min(air_time * constants.DRAG_COEFFECIENT, constants.MAX_AIR_DRAG)
+            speed += constants.SPRINT_CONSTANT - drag
+        x += direction * speed
+        xs.append(x)
+
+    vy = 0
+    if jump:
+        vy = -constants.JUMP_STRENGTH * (
+            constants.SPRINT_JUMP_HEIGHT_MULTIPLIER if sprint else 1
+        )
+    return xs, vy, direction
+
+
+def player_arcs(tile_size, sprint):
+    # jumps start either against a wall or overhanging a ledge as far as the
+    # body allows, walking off a ledge starts once the whole body has left it
+    arcs = []
+    for direction in (-1, 1):
+        for overhang in (0, PLAYER_SIZE[0] - 1):
+            arcs.append(player_arc(tile_size, direction, sprint, True, overhang))
+        arcs.append(player_arc(tile_size, direction, sprint, False, PLAYER_SIZE[0]))
+    return arcs
+
+
+class Analysis:
+    def __init__(self, grid, start):
+        self.grid = grid
+        self.start = start
+        self.reachable = bytearray(grid.width * grid.height)
+        self.walk_reachable = bytearray(grid.width * grid.height)
+        self.warnings = []
+        self.time = 0
+
+    def reached(self, x, y):
+        return self.grid.inside(x, y) and self.reachable[self.grid.index(x, y)] != 0
+
+    def needs_sprint(self, x, y):
+        return self.reached(x, y) and not self.walk_reachable[self.grid.index(x, y)]
+
+
+def follow_arc(grid, node, arc):
+    # per-axis collision like PhysicsEntity.update: walls stop the horizontal
+    # part of the arc, ceilings zero the vertical velocity, floors land
+    xs, vy, direction = arc
+    solid = grid.solid
+    size = grid.tile_size
+    height = PLAYER_SIZE[1]
+    gravity = 0.01 * constants.GRAVITY_CONSTANT
+    bottom = grid.y0 + grid.height
+    origin_x = node[0] * size
+    column, row = node
+    y = (row + 1) * size
+    head = (y - height) // size
+    lag = 0
+    for x in xs:
+        next_column = (origin_x + x - lag) // size
+        if next_column != column:
+            if solid(next_column, row) or solid(next_column, head):
+                lag = origin_x + x - column * size
+                if direction > 0:
+                    lag -= size - 1
+            else:
+                column = next_column
+
+        y += vy
+        vy = min(5, vy + gravity)
+        next_head = (y - height) // size
+        if next_head != head:
+            if next_head < head and solid(column, next_head):
+                y = (next_head + 1) * size + height
+                vy = 0
+            else:
+                head = next_head
+
+        next_row = (y - 1) // size
+        if next_row != row:
+            if next_row >= bottom:
+                return None
+            if next_row > row and solid(column, next_row):
+                if (column, row) != node and grid.standable(column, row):
+                    return int(column), int(row)
+                return None
+            row = next_row
+    return None
+
+
+def explore(grid, start, arcs, landings):
+    reachable = bytearray(grid.width * grid.height)
+    reachable[grid.index(*start)] = 1
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        targets = [(node[0] - 1, node[1]), (node[0] + 1, node[1])]
+        for arc in arcs:
+            key = (node, id(arc))
+            if key not in landings:
+                landings[key] = follow_arc(grid, node, arc)
+            targets.append(landings[key])
+        for target in targets:
+            if target is None or not grid.standable(*target):
+                continue
+            index = grid.index(*target)
+            if not reachable[index]:
+                reachable[index] = 1
+                queue.append(target)
+    return reachable
+
+
+def ground_below(grid, pos):
+    # the cell an entity spawned at pos (its top left corner) comes to rest in
+    x, y = grid.cell_at((pos[0] + PLAYER_SIZE[0] / 2, pos[1] + PLAYER_SIZE[1] - 1))
+    while not grid.solid(x, y + 1) and y < grid.y0 + grid.height:
+        y += 1
+    return x, y
+
+
+def spawner_warnings(analysis, tilemap):
+    grid = analysis.grid
+    mirrors = tilemap.offgrid_positions("skeleton_path_mirror")
+    for spawner in tilemap.offgrid_positions("skeleton_spawner"):
+        x, y = ground_below(grid, spawner)
+        if not grid.standable(x, y):
+            analysis.warnings.append(
+                f"skeleton_spawner at {list(spawner)} has no solid ground below it"
+            )
+            continue
+
+        left = right = None
+        for mirror in mirrors:
+            mx, my = grid.cell_at(mirror)
+            if abs(my - y) > 1:
+                continue
+            if mx <= x and (left is None or mx > left):
+                left = mx
+            if mx >= x and (right is None or mx < right):
+                right = mx
+        if left is None or right is None:
+            analysis.warnings.append(
+                f"skeleton_spawner at {list(spawner)} is missing a"
+                f" skeleton_path_mirror on its {'left' if left is None else 'right'}"
+            )
+        else:
+            for column in range(left, right + 1):
+                if not grid.standable(column, y):
+                    analysis.warnings.append(
+                        f"skeleton_spawner at {list(spawner)} can walk off the"
+                        f" ground at cell {column};{y} before reaching a mirror"
+                    )
+                    break
+
+        if not analysis.reached(x, y):
+            analysis.warnings.append(
+                f"skeleton_spawner at {list(spawner)} is unreachable by the player"
+            )
+
+
+def gap_warnings(analysis):
+    grid = analysis.grid
+    for index, reached in enumerate(analysis.reachable):
+        if not reached:
+            continue
+        x = grid.x0 + index % grid.width
+        y = grid.y0 + index // grid.width
+        if grid.standable(x + 1, y) or grid.solid(x + 1, y):
+            continue
+        for far in range(x + 2, x + MAX_GAP_CELLS):
+            if grid.solid(far, y):
+                break
+            if grid.standable(far, y):
+                if not analysis.reached(far, y):
+                    analysis.warnings.append(
+                        f"gap between cells {x};{y} and {far};{y} can't be crossed"
+                        f" with JUMP_STRENGTH={constants.JUMP_STRENGTH}"
+                        f" and SPRINT_CONSTANT={constants.SPRINT_CONSTANT}"
+                    )
+                elif analysis.needs_sprint(far, y):
+                    analysis.warnings.append(
+                        f"gap between cells {x};{y} and {far};{y} needs a sprint jump"
+                    )
+                break
+
+
+def analyze(tilemap):
+    start_time = time.perf_counter()
+    grid = SolidGrid(tilemap)
+
+    start = None
+    for spawner in tilemap.offgrid_positions("player_spawner"):
+        start = ground_below(grid, spawner)
+
+    analysis = Analysis(grid, start)
+    if start is None or not grid.standable(*start):
+        analysis.warnings.append("level has no player_spawner on solid ground")
+    else:
+        walk_arcs = player_arcs(grid.tile_size, False)
+        sprint_arcs = player_arcs(grid.tile_size, True)
+        landings = {}
+        analysis.walk_reachable = explore(grid, start, walk_arcs, landings)
+        analysis.reachable = explore(grid, start, walk_arcs + sprint_arcs, landings)
+        gap_warnings(analysis)
+    spawner_warnings(analysis, tilemap)
+
+    analysis.time = time.perf_counter() - start_time
+    return analysis
+
+
+def analyze_grid(grid, job=None):
+    # runs on the FileIO worker, so it gets its own tilemap around a grid
+    # snapshot instead of reading the one being edited
+    tilemap = Tilemap(None)
+    tilemap.load_grid(grid)
+    analysis = analyze(tilemap)
+    if job is not None:
+        job.progress = 1.0
+    return analysis
+
+
+if __name__ == "__main__":
+    result = analyze_grid(
+        fileio.read_map(sys.argv[1] if len(sys.argv) > 1 else "data/maps/level1.json")
+    )
+    for warning in result.warnings:
+        print(warning)
+    print(
+        f"{sum(result.reachable)} reachable cells,"
+        f" {len(result.warnings)} warnings in {result.time * 1000:.1f}ms"
+    )
@@ -0,0 +1,77 @@
+import pygame
+
+
+class Clip:
+    def __init__(self, images, img_dur=5, loop=True):
+        self.images = tuple(images)
+        self.loop = loop
+        self.img_duration = img_dur
+        length = img_dur * len(self.images)
+        self.last = length - 1
+        # everything an entity needs per tick is looked up by its cursor, so
+        # advancing and drawing never divide or take a modulo
+        self.frames = tuple(self.images[i // img_dur] for i in range(length))
+        flipped = {
+            id(img): pygame.transform.flip(img, True, False)
+            for img in self.images
+            if isinstance(img, pygame.Surface)
+        }
+        self.flipped_frames = tuple(flipped.get(id(img), img) for img in self.frames)
+        if loop:
+            self.next = tuple(range(1, length)) + (0,)
+        else:
+            self.next = tuple(range(1, length)) + (self.last,)
+
+
+EMPTY_CLIP = Clip([None], img_dur=1)
+
+
+class Animator:
+    def __init__(self, assets):
+        self.assets = assets
+        self.clip_sets = {}
+        self.clips = []
+        self.cursors = []
+        self.free = []
+
+    def clips_for(self, e_type):
+        if e_type not in self.clip_sets:
+            prefix = e_type + "/"
+            self.clip_sets[e_type] = {
+                name[len(prefix) :]: clip
+                for name, clip in self.assets.items()
+                if name.startswith(prefix) and isinstance(clip, Clip)
+            }
+        return self.clip_sets[e_type]
+
+    def add(self):
+        if self.free:
+            return self.free.pop()
+        self.clips.append(EMPTY_CLIP)
+        self.cursors.append(0)
+        return len(self.clips) - 1
+
+    def remove(self, slot):
+        self.clips[slot] = EMPTY_CLIP
+        self.cursors[slot] = 0
+        self.free.append(slot)
+
+    def play(self, slot, clip):
+        if self.clips[slot] is not clip:
+            self.clips[slot] = clip
+            self.cursors[slot] = 0
+
+    def advance(self):
+        clips = self.clips
+        cursors = self.cursors
+        for slot in range(len(cursors)):
+            cursors[slot] = clips[slot].next[cursors[slot]]
+
+    def image(self, slot, flip=False):
+        if flip:
+            return self.clips[slot].flipped_frames[self.cursors[slot]]
+        return self.clips[slot].frames[self.cursors[slot]]
+
+    def done(self, slot):
+        clip = self.clips[slot]
+        return not clip.loop and self.cursors[slot] == clip.last
@@ -0,0 +1,79 @@
+class Camera:
+    def __init__(self, size, tile_size=32, smoothing=30):
+        self.width, self.height = size
+        self.tile_size = tile_size
+        self.smoothing = smoothing
+        self.scroll = [0, 0]
+        self.bounds = None
+        self.update()
+
+    def fit(self, tilemap):
+        # the level ends where the grid tiles end, so the view is kept inside
+        # them instead of relying on hand tuned limits
+        self.tile_size = tilemap.tile_size
+        bounds = tilemap.bounds()
+        if bounds is None:
+            self.bounds = None
+            return
+        left, top, right, bottom = bounds
+        self.bounds = (
+            left * self.tile_size,
+            top * self.tile_size,
+            (right + 1) * self.tile_size,
+            (bottom + 1) * self.tile_size,
+        )
+        self.clamp()
+        self.update()
+
+    def clamp(self):
+        if self.bounds is None:
+            return
+        left, top, right, bottom = self.bounds
+        for axis, low, high, view in (
+            (0, left, right, self.width),
+            (1, top, bottom, self.height),
+        ):
+            if high - low <= view:
+                self.scroll[axis] = (low + high - view) / 2
+            else:
+                self.scroll[axis] = min(max(self.scroll[axis], low), high - view)
+
+    def follow(self, pos):
+        self.scroll[0] += (pos[0] - self.width / 2 - self.scroll[0]) / self.smoothing
+        self.scroll[1] += (pos[1] - self.height / 2 - self.scroll[1]) / self.smoothing
+        self.clamp()
+        self.update()
+
+    def center_on(self, pos):
+        self.scroll[0] = pos[0] - self.width / 2
+        self.scroll[1] = pos[1] - self.height / 2
+        self.clamp()
+        self.update()
+
+    def move(self, dx, dy):
+        self.scroll[0] += dx
+        self.scroll[1] += dy
+        self.update()
+
+    def update(self):
+        # everything drawn this frame shares one integer offset and one range
+        # of visible cells
+        self.offset = (int(self.scroll[0]), int(self.scroll[1]))
+        self.columns = range(
+            self.offset[0] // self.tile_size,
+            (self.offset[0] + self.width) // self.tile_size + 1,
+        )
+        self.rows = range(
+            self.offset[1] // self.tile_size,
+            (self.offset[1] + self.height) // self.tile_size + 1,
+        )
+
+    def to_screen(self, pos):
+        return (pos[0] - self.offset[0], pos[1] - self.offset[1])
+
+    def to_world(self, pos):
+        return (pos[0] + self.scroll[0], pos[1] + self.scroll[1])
+
+    def cell_at(self, pos):
+        x, y = self.to_world(pos)
+        return (int(x // self.tile_size), int(y // self.tile_size))
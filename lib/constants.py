@@ -2,8 +2,19 @@ RESOLUTION = (1880, 1080)
 WINDOW_NAME = "{Placeholder for name}"
 SCALING_FACTOR = 2
 
-VERTICAL_SCROLL_LIMIT = {"min": 100, "max": 100}
-HORIZONTAL_SCROLL_LIMIT = {"min": 128, "max": 2195}
+LEVELS = ["data/maps/level1.json"]
+LEVEL_CACHE_SIZE = 3
+MAX_PARTICLES = 50000
+SHOW_DRAW_CALLS = False
+HOT_RELOAD_INTERVAL = 15
+# seconds of startup work done between loading frames, and the time to the
+# first frame in milliseconds that --startup-trace warns about
+STARTUP_FRAME_BUDGET = 1 / 120
+FIRST_FRAME_BUDGET = 250
+
+CAMERA_SMOOTHING = 30
+# (image, scroll factor) from the back, 0 keeps a layer fixed to the screen
+PARALLAX_LAYERS = [("background.png", 0.15)]
 
 GRAVITY_CONSTANT = 10
 SPRINT_CONSTANT = 1
@@ -15,3 +26,5 @@ ATTACK_COOLDOWN = 0.5
 
 ENEMY_SPEED = 0.5
 ENEMY_HEALTH = 30
+ENEMY_JUMP_STRENGTH = 3
+ENEMY_CHASE_RANGE = 16
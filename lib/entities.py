@@ -1,7 +1,6 @@
-import pygame.transform
 import pygame
 
-from lib import constants, utils
+from lib import constants, navigation, renderer, utils
 
 
 class PhysicsEntity:
@@ -16,6 +15,8 @@ class PhysicsEntity:
         self.action = ""
         self.anim_offset = [0, -0]
         self.flip = False
+        self.clips = game.animator.clips_for(e_type)
+        self.slot = game.animator.add()
         self.set_action("idle")
 
     def rect(self) -> pygame.Rect:
@@ -24,7 +25,7 @@ class PhysicsEntity:
     def set_action(self, action):
         if action != self.action:
             self.action = action
-            self.animation = self.game.assets[self.type + "/" + self.action].copy()
+            self.game.animator.play(self.slot, self.clips[action])
 
     def update(self, tilemap, movement=(0, 0)):
         self.collisions = {"up": False, "down": False, "right": False, "left": False}
@@ -70,62 +71,62 @@ class PhysicsEntity:
         if self.collisions["down"] or self.collisions["up"]:
             self.velocity[1] = 0
 
-        self.animation.update()
+    def render(self, queue):
+        img = self.game.animator.image(self.slot, self.flip)
 
-    def render(self, surf, offset=(0, 0)):
-        img = pygame.transform.scale_by(self.animation.img(), 1)
-
-        surface = pygame.Surface(self.rect().size)
-        surface.fill((255, 0, 0))
-        surf.blit(
-            pygame.transform.flip(img, self.flip, False),
+        queue.submit(
+            renderer.ENTITIES,
+            img,
             (
                 self.pos[0]
                 - img.width / 2
                 + self.size[0] / 2
-                - offset[0]
                 + (self.anim_offset[0] * -1 if self.flip else 1),
-                self.pos[1]
-                - img.height
-                + self.size[1]
-                - offset[1]
-                + self.anim_offset[1],
+                self.pos[1] - img.height + self.size[1] + self.anim_offset[1],
             ),
         )
 
-        # surf.blit(
-        #     surface,
-        #     (self.pos[0] - offset[0], self.pos[1] - offset[1]),
-        # )
-
 
 class Skeleton(PhysicsEntity):
     def __init__(self, game, pos, size):
         super().__init__(game, "skeleton", pos, size)
         self.velocity = [constants.ENEMY_SPEED, 0]
-        self.animation.img_dur = 1
         self.health = constants.ENEMY_HEALTH
         self.time_since_damage = 0
         self.time_since_death = 0
         self.dead = False
 
-    def get_mirror_rects(self):
-        mirror_blocks = []
-        for tile in self.game.tilemap.offgrid_tiles:
-            if tile["type"] == "skeleton_path_mirror":
-                rect = pygame.Rect(
-                    tile["pos"][0],
-                    tile["pos"][1],
-                    10,
-                    10,
-                )
-                mirror_blocks.append(rect)
-        return mirror_blocks
+    def steer(self):
+        player = self.game.player
+        rect = self.rect()
+        direction = None
+        if not player.dead:
+            direction = self.game.flow_field.sample(rect.midbottom)
+
+        if direction is not None and direction[2] <= constants.ENEMY_CHASE_RANGE:
+            step, kind, _ = direction
+            if step == 0:
+                offset = player.rect().centerx - rect.centerx
+                step = (offset > 0) - (offset < 0)
+            self.velocity[0] = step * constants.ENEMY_SPEED
+            if kind == navigation.JUMP and self.collisions["down"]:
+                self.velocity[1] = -constants.ENEMY_JUMP_STRENGTH
+            return
+
+        if self.velocity[0] == 0:
+            self.velocity[0] = (
+                -constants.ENEMY_SPEED if self.flip else constants.ENEMY_SPEED
+            )
+        for block in self.game.navigation.mirror_rects:
+            if rect.colliderect(block):
+                if block.centerx > rect.centerx:
+                    self.velocity[0] = -constants.ENEMY_SPEED
+                else:
+                    self.velocity[0] = constants.ENEMY_SPEED
 
     def update(self, tilemap):
-        for block in self.get_mirror_rects():
-            if self.rect().colliderect(block):
-                self.velocity[0] = -self.velocity[0]
+        if not self.dead and self.health > 0:
+            self.steer()
 
         self.time_since_damage += 1
 
@@ -135,6 +136,8 @@ class Skeleton(PhysicsEntity):
         player = self.game.player
 
         if self.health <= 0:
+            if not self.dead:
+                self.game.particles.emit("bone", self.rect().center)
             self.set_action("death")
             self.dead = True
             self.velocity = [0, 0]
@@ -151,6 +154,7 @@ class Skeleton(PhysicsEntity):
                 self.health -= 10
                 self.time_since_damage = 0
                 self.set_action("hit")
+                self.game.particles.emit("hit", self.rect().center)
 
         super().update(tilemap, (0, 0))
 
@@ -185,13 +189,15 @@ class Player(PhysicsEntity):
         if (
             self.health <= 0
             or self.air_time / 60 > 1.5
-            and self.pos[1] > self.game.display.get_size()[1]
+            and self.pos[1] > self.game.view_size[1]
         ):
             self.dead = True
             self.time_since_death += 1
             self.set_action("death")
 
         if self.collisions["down"]:
+            if self.air_time > 20:
+                self.game.particles.emit("dust", self.rect().midbottom)
             self.air_time = 0
 
         if self.dead:
@@ -206,6 +212,11 @@ class Player(PhysicsEntity):
             if self.attack_time < 20:
                 self.attack_time += 1
                 self.anim_offset[0] = 0
+                if self.attack_time == 1:
+                    rect = self.rect()
+                    self.game.particles.emit(
+                        "slash", rect.midleft if self.flip else rect.midright
+                    )
             else:
                 self.attack_time = 0
                 self.anim_offset[0] = 0
@@ -254,30 +265,29 @@ class Player(PhysicsEntity):
                 self.time_since_damage = 0
                 self.game.heart_grow_animation_time = 60
 
-        for tile in self.game.player_collision_detectors:
-            rect = self.rect()
-            tile_rect = pygame.Rect(tile["pos"][0], tile["pos"][1], 10, 10)
-            if rect.colliderect(tile_rect):
-                if (
-                    tile["pos"][0] > 410
-                    and tile["pos"][0] < 414
-                    and constants.JUMP_STRENGTH < 2.5
-                ):
-                    self.has_hit_collider = True
-                    if self.time_since_collision > 10:
-                        self.game.popup_index = 0
-                elif tile["pos"][0] > 759 and tile["pos"][0] < 805:
-                    self.has_hit_collider = True
-                    if self.time_since_collision > 60 * 0.25:
-                        self.game.popup_index = 1
-                elif (
-                    tile["pos"][0] > 2082
-                    and tile["pos"][0] < 2284
-                    and constants.SPRINT_CONSTANT < 1.1
-                ):
-                    self.has_hit_collider = True
-                    if self.time_since_collision > 60 * 0.25:
-                        self.game.popup_index = 2
+        detectors = self.game.player_collision_detectors
+        for i in self.rect().collidelistall(self.game.player_collision_rects):
+            tile = detectors[i]
+            if (
+                tile["pos"][0] > 410
+                and tile["pos"][0] < 414
+                and constants.JUMP_STRENGTH < 2.5
+            ):
+                self.has_hit_collider = True
+                if self.time_since_collision > 10:
+                    self.game.popup_index = 0
+            elif tile["pos"][0] > 759 and tile["pos"][0] < 805:
+                self.has_hit_collider = True
+                if self.time_since_collision > 60 * 0.25:
+                    self.game.popup_index = 1
+            elif (
+                tile["pos"][0] > 2082
+                and tile["pos"][0] < 2284
+                and constants.SPRINT_CONSTANT < 1.1
+            ):
+                self.has_hit_collider = True
+                if self.time_since_collision > 60 * 0.25:
+                    self.game.popup_index = 2
 
         if self.sprinting:
             if movement[0] > 0:
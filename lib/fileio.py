@@ -0,0 +1,221 @@
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.tilemap import TILE_TYPES, GridBuilder
+
+CHUNK_SIZE = 1 << 16
+TILES_PER_CHUNK = 512
+
+
+class IOJob:
+    def __init__(self, kind, path, callback=None):
+        self.kind = kind
+        self.path = path
+        self.callback = callback
+        self.progress = 0.0
+        self.future = None
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+DECODER = json.JSONDecoder()
+
+
+def skip(text, index):
+    return WHITESPACE.match(text, index).end()
+
+
+def members(text, index, visit, job=None):
+    # json.loads holds the GIL for the whole call, so the outer containers of
+    # a level are walked member by member and only the small values inside
+    # them are handed to the C scanner, which lets the main thread keep
+    # drawing while a big map loads. visit(key, index) decodes the member
+    # starting at index, with key None in arrays, and returns where it ends
+    index = skip(text, index)
+    is_object = text[index] == "{"
+    closing = "}" if is_object else "]"
+    index = skip(text, index + 1)
+    if text[index] == closing:
+        return index + 1
+    while True:
+        key = None
+        if is_object:
+            key, index = DECODER.raw_decode(text, index)
+            index = skip(text, index)
+            if text[index] != ":":
+                raise json.JSONDecodeError("Expecting ':' delimiter", text, index)
+            index = skip(text, index + 1)
+        index = visit(key, index)
+        if job is not None:
+            job.progress = 0.5 + index / len(text) * 0.5
+        index = skip(text, index)
+        if text[index] == closing:
+            return index + 1
+        if text[index] != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+        index = skip(text, index + 1)
+
+
+def read_text(path, job=None):
+    size = os.path.getsize(path)
+    chunks = []
+    read = 0
+    with open(path, "r") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            read += len(chunk)
+            if job is not None and size:
+                job.progress = min(read / size, 1.0) * 0.5
+    return "".join(chunks)
+
+
+def parse(text, parser, job=None):
+    try:
+        data, index = parser(text)
+    except IndexError:
+        raise json.JSONDecodeError("Unexpected end of data", text, len(text))
+    if skip(text, index) != len(text):
+        raise json.JSONDecodeError("Extra data", text, index)
+    if job is not None:
+        job.progress = 1.0
+    return data
+
+
+def read_map(path, job=None):
+    # tiles go into a GridBuilder as soon as each one is decoded. Holding the
+    # whole map as dicts first would leave hundreds of thousands of objects
+    # alive, and the collector's full passes over them run with the GIL held
+    # and stop the main thread too
+    text = read_text(path, job)
+    builder = GridBuilder()
+    fields = {}
+
+    def add_tile(key, index):
+        tile, index = DECODER.raw_decode(text, index)
+        builder.add_tile(tile["type"], tile["variant"], tile["pos"])
+        return index
+
+    def add_offgrid(key, index):
+        tile, index = DECODER.raw_decode(text, index)
+        builder.add_offgrid(tile["type"], tile["variant"], tile["pos"])
+        return index
+
+    def visit(key, index):
+        if key == "tilemap":
+            return members(text, index, add_tile, job)
+        if key == "offgrid":
+            return members(text, index, add_offgrid, job)
+        fields[key], index = DECODER.raw_decode(text, index)
+        return index
+
+    parse(text, lambda text: (fields, members(text, 0, visit)), job)
+    return builder.finish(fields["tile_size"])
+
+
+def encode_map(grid, job=None):
+    # same output as json.dump of the map in the file format, with the tile
+    # dicts built from the grid's bytes and encoded a slice at a time
+    types = grid.types
+    variants = grid.variants
+    cells = [index for index in range(len(types)) if types[index]]
+    offgrid = grid.offgrid
+    total = len(cells) + len(offgrid) or 1
+    done = 0
+
+    yield '{"tilemap": {'
+    for start in range(0, len(cells), TILES_PER_CHUNK):
+        chunk = {}
+        for index in cells[start : start + TILES_PER_CHUNK]:
+            y, x = divmod(index, grid.width)
+            x += grid.x0
+            y += grid.y0
+            chunk[str(x) + ";" + str(y)] = {
+                "type": TILE_TYPES[types[index]],
+                "variant": variants[index],
+                "pos": [x, y],
+            }
+        yield (", " if start else "") + json.dumps(chunk)[1:-1]
+        done += len(chunk)
+        if job is not None:
+            job.progress = done / total * 0.9
+    yield '}, "tile_size": ' + json.dumps(grid.tile_size) + ', "offgrid": ['
+    for start in range(0, len(offgrid), TILES_PER_CHUNK):
+        chunk = [
+            {"type": TILE_TYPES[tile], "variant": variant, "pos": [x, y]}
+            for tile, variant, x, y in offgrid[start : start + TILES_PER_CHUNK]
+        ]
+        yield (", " if start else "") + json.dumps(chunk)[1:-1]
+        done += len(chunk)
+        if job is not None:
+            job.progress = done / total * 0.9
+    yield "]}"
+
+
+def write_atomic(path, parts):
+    # written next to the target and renamed over it, so a crash mid save
+    # never leaves a truncated level behind
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            for part in parts:
+                f.write(part)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates private files, keep the permissions a plain open
+        # would have given the level
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def write_map(path, grid, job=None):
+    write_atomic(path, encode_map(grid, job))
+    if job is not None:
+        job.progress = 1.0
+    return path
+
+
+class FileIO:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.jobs = []
+
+    def submit(self, job, fn, *args):
+        job.future = self.executor.submit(fn, *args, job)
+        self.jobs.append(job)
+        return job
+
+    def load(self, path, callback=None):
+        return self.submit(IOJob("loading", path, callback), read_map, path)
+
+    def save(self, path, grid, callback=None):
+        return self.submit(IOJob("saving", path, callback), write_map, path, grid)
+
+    def poll(self):
+        # called once per frame, so callbacks always run on the main thread
+        finished = [job for job in self.jobs if job.done()]
+        for job in finished:
+            self.jobs.remove(job)
+            if job.callback is not None:
+                job.callback(job)
+        return finished
@@ -0,0 +1,96 @@
+import importlib
+import os
+import traceback
+
+from lib import constants, fileio
+from lib.levels import Level
+from lib.navigation import NAVIGATION_CONSTANTS
+from lib.parallax import ParallaxBackground
+
+
+def modified(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class HotReloader:
+    def __init__(self, game, interval=constants.HOT_RELOAD_INTERVAL):
+        self.game = game
+        self.interval = interval
+        self.frame = 0
+        self.io = fileio.FileIO()
+        self.stamps = {path: modified(path) for path in self.watched()}
+
+    def watched(self):
+        return [constants.__file__] + self.game.levels.paths
+
+    def poll(self):
+        self.io.poll()
+        self.frame += 1
+        if self.frame % self.interval:
+            return
+        for path in self.watched():
+            stamp = modified(path)
+            if stamp == self.stamps.get(path, stamp):
+                self.stamps[path] = stamp
+                continue
+            self.stamps[path] = stamp
+            if stamp is None:
+                continue
+            if path == constants.__file__:
+                self.reload_constants()
+            else:
+                self.io.load(path, self.level_loaded)
+
+    def reload_constants(self):
+        old = {name: value for name, value in vars(constants).items() if name.isupper()}
+        try:
+            importlib.reload(constants)
+        except Exception:
+            # a half typed edit keeps the last values that worked
+            traceback.print_exc()
+            vars(constants).update(old)
+            return
+        changed = {
+            name
+            for name in old.keys() | vars(constants).keys()
+            if name.isupper() and old.get(name) != getattr(constants, name, None)
+        }
+        if not changed:
+            return
+        print("reloaded", ", ".join(sorted(changed)))
+
+        game = self.game
+        if changed & NAVIGATION_CONSTANTS:
+            game.navigation.build()
+            game.flow_field.reset()
+        if "CAMERA_SMOOTHING" in changed:
+            game.camera.smoothing = constants.CAMERA_SMOOTHING
+        if "PARALLAX_LAYERS" in changed:
+            game.background = ParallaxBackground(
+                constants.PARALLAX_LAYERS, game.display.get_size()
+            )
+        if "LEVELS" in changed:
+            game.levels.paths = list(constants.LEVELS)
+        if "LEVEL_CACHE_SIZE" in changed:
+            game.levels.cache_size = constants.LEVEL_CACHE_SIZE
+        if "MAX_PARTICLES" in changed:
+            game.particles.resize(constants.MAX_PARTICLES)
+        if "SHOW_DRAW_CALLS" in changed and constants.SHOW_DRAW_CALLS:
+            game.load_debug_font()
+        if "HOT_RELOAD_INTERVAL" in changed:
+            self.interval = constants.HOT_RELOAD_INTERVAL
+
+    def level_loaded(self, job):
+        try:
+            level = Level(job.path, job.result())
+        except Exception:
+            traceback.print_exc()
+            return
+        self.game.levels.replace(level)
+        if self.game.level.path == job.path:
+            self.game.reload_level(level)
+        print("reloaded", job.path)
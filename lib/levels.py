@@ -0,0 +1,111 @@
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from lib import constants, fileio
+from lib.tilemap import TILE_TYPES
+
+SPAWNER_TILES = {
+    "player_spawner",
+    "skeleton_spawner",
+    "player_collision_detector",
+    "level_exit",
+    "checkpoint",
+}
+
+
+class Level:
+    def __init__(self, path, grid):
+        self.path = path
+        self.grid = grid
+        self.spawners = {tile_type: [] for tile_type in SPAWNER_TILES}
+        for tile, variant, x, y in grid.offgrid:
+            name = TILE_TYPES[tile]
+            if name in self.spawners:
+                self.spawners[name].append(
+                    {"type": name, "variant": variant, "pos": [x, y]}
+                )
+
+
+def read_level(path):
+    return Level(path, fileio.read_map(path))
+
+
+class LevelManager:
+    def __init__(self, paths, cache_size=constants.LEVEL_CACHE_SIZE):
+        self.paths = list(paths)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.loading = {}
+        self.index = 0
+        self.pending = None
+
+    def cached(self, path):
+        with self.lock:
+            level = self.cache.get(path)
+            if level is not None:
+                self.cache.move_to_end(path)
+            return level
+
+    def store(self, level):
+        with self.lock:
+            self.cache[level.path] = level
+            self.cache.move_to_end(level.path)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def replace(self, level):
+        # swaps an edited level into the cache without changing its place
+        with self.lock:
+            if level.path in self.cache:
+                self.cache[level.path] = level
+
+    def fetch(self, path):
+        level = read_level(path)
+        self.store(level)
+        return level
+
+    def preload(self, index):
+        if not 0 <= index < len(self.paths):
+            return
+        path = self.paths[index]
+        if path not in self.loading and self.cached(path) is None:
+            self.loading[path] = self.executor.submit(self.fetch, path)
+
+    def load(self, index):
+        path = self.paths[index]
+        level = self.cached(path)
+        future = self.loading.pop(path, None)
+        if level is None:
+            level = future.result() if future is not None else self.fetch(path)
+        self.index = index
+        self.pending = None
+        self.preload(index + 1)
+        return level
+
+    def request(self, index):
+        if 0 <= index < len(self.paths) and index != self.pending:
+            self.pending = index
+            self.preload(index)
+
+    def poll(self):
+        # called between frames, hands over the requested level once the
+        # background thread has it so the game never waits on json.load
+        if self.pending is None:
+            return None
+        future = self.loading.get(self.paths[self.pending])
+        if future is not None and not future.done():
+            return None
+        try:
+            return self.load(self.pending)
+        except FileNotFoundError:
+            self.pending = None
+            return None
+        except Exception:
+            # a broken level file keeps the current level playing
+            traceback.print_exc()
+            self.pending = None
+            return None
@@ -0,0 +1,122 @@
+import pygame
+
+from lib.tilemap import RENDERED, TILE_TYPES
+
+PANEL_SIZE = (240, 120)
+MAX_SCALE = 4
+MARGIN = 5
+EMPTY_COLOUR = (20, 18, 24)
+FRAME_COLOUR = (200, 200, 200)
+MARKER_COLOUR = (255, 60, 60)
+
+
+class Minimap:
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.area = pygame.Rect(0, 0, 0, 0)
+        self.rebuild()
+
+    def palette(self):
+        # one colour per tile id, the average of its first variant
+        if self.tilemap.game is not None:
+            self.tilemap.sync_images()
+        colours = [EMPTY_COLOUR] * 256
+        for tile in range(1, len(TILE_TYPES)):
+            images = (
+                self.tilemap.images[tile] if tile < len(self.tilemap.images) else None
+            )
+            if RENDERED[tile] and images:
+                colours[tile] = pygame.transform.average_color(images[0])[:3]
+        return colours
+
+    def rebuild(self):
+        # the type id grid already is an 8 bit image of the level, so the
+        # whole map is built with one frombytes and one scale
+        tilemap = self.tilemap
+        self.x0 = tilemap.x0
+        self.y0 = tilemap.y0
+        self.width = max(tilemap.width, 1)
+        self.height = max(tilemap.height, 1)
+        self.scale = max(
+            1,
+            min(
+                PANEL_SIZE[0] // self.width,
+                PANEL_SIZE[1] // self.height,
+                MAX_SCALE,
+            ),
+        )
+        cells = bytes(tilemap.types) or bytes(1)
+        image = pygame.image.frombytes(cells, (self.width, self.height), "P")
+        self.image = pygame.transform.scale_by(image, self.scale)
+        self.colours = len(TILE_TYPES)
+        self.image.set_palette(self.palette())
+
+    def update_cell(self, x, y):
+        # painting touches one cell, so only that cell is redrawn
+        tilemap = self.tilemap
+        if (tilemap.x0, tilemap.y0, max(tilemap.width, 1)) != (
+            self.x0,
+            self.y0,
+            self.width,
+        ) or max(tilemap.height, 1) != self.height:
+            self.rebuild()
+            return
+        index = tilemap.index(x, y)
+        if index < 0:
+            return
+        if self.colours != len(TILE_TYPES):
+            self.colours = len(TILE_TYPES)
+            self.image.set_palette(self.palette())
+        self.image.fill(
+            tilemap.types[index],
+            (
+                (x - self.x0) * self.scale,
+                (y - self.y0) * self.scale,
+                self.scale,
+                self.scale,
+            ),
+        )
+
+    def to_map(self, pos):
+        return (
+            pos[0] / self.tilemap.tile_size * self.scale - self.x0 * self.scale,
+            pos[1] / self.tilemap.tile_size * self.scale - self.y0 * self.scale,
+        )
+
+    def draw(self, surf, camera, marker=None):
+        # maps bigger than the panel show the part around the camera
+        view = pygame.Rect(
+            self.to_map(camera.offset),
+            (
+                camera.width / self.tilemap.tile_size * self.scale,
+                camera.height / self.tilemap.tile_size * self.scale,
+            ),
+        )
+        self.area = pygame.Rect((0, 0), self.image.get_size()).clip(
+            pygame.Rect((0, 0), PANEL_SIZE)
+        )
+        self.area.center = view.center
+        self.area.clamp_ip(self.image.get_rect())
+        self.rect = pygame.Rect(
+            (surf.get_width() - self.area.width - MARGIN, MARGIN), self.area.size
+        )
+
+        surf.blit(self.image, self.rect, self.area)
+        pygame.draw.rect(surf, FRAME_COLOUR, self.rect.inflate(2, 2), 1)
+        view.move_ip(self.rect.x - self.area.x, self.rect.y - self.area.y)
+        pygame.draw.rect(surf, FRAME_COLOUR, view.clip(self.rect), 1)
+        if marker is not None:
+            x, y = self.to_map(marker)
+            point = (self.rect.x - self.area.x + x, self.rect.y - self.area.y + y)
+            if self.rect.collidepoint(point):
+                pygame.draw.circle(surf, MARKER_COLOUR, point, 2)
+
+    def world_at(self, point):
+        # turns a point on the drawn minimap back into a world position
+        x = point[0] - self.rect.x + self.area.x
+        y = point[1] - self.rect.y + self.area.y
+        return (
+            (x / self.scale + self.x0) * self.tilemap.tile_size,
+            (y / self.scale + self.y0) * self.tilemap.tile_size,
+        )
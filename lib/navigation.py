@@ -0,0 +1,144 @@
+from collections import deque
+
+import pygame
+
+from lib import constants
+from lib.tilemap import SOLID
+
+WALK = 0
+FALL = 1
+JUMP = 2
+
+MAX_FALL_CELLS = 24
+FLOW_FIELD_BUDGET = 256
+# the graph copies these when it is built, so it has to be rebuilt when they
+# change, everything else is read through the module on use
+NAVIGATION_CONSTANTS = {"GRAVITY_CONSTANT", "ENEMY_JUMP_STRENGTH", "ENEMY_SPEED"}
+
+
+class NavGraph:
+    def __init__(self, tilemap):
+        self.tilemap = tilemap
+        self.build()
+
+    def build(self):
+        self.tile_size = self.tilemap.tile_size
+        self.solids = {(x, y) for x, y, tile, _ in self.tilemap.tiles() if SOLID[tile]}
+
+        # a node is an empty cell with a solid cell directly below it
+        self.nodes = set()
+        for x, y in self.solids:
+            if (x, y - 1) not in self.solids:
+                self.nodes.add((x, y - 1))
+
+        self.edges = {node: [] for node in self.nodes}
+        self.incoming = {node: [] for node in self.nodes}
+        for node in self.nodes:
+            for target, kind in self.links_from(node):
+                self.edges[node].append((target, kind))
+                self.incoming[target].append((node, kind))
+
+        self.mirror_rects = [
+            pygame.Rect(x, y, 10, 10)
+            for x, y in self.tilemap.offgrid_positions("skeleton_path_mirror")
+        ]
+
+    def jump_reach(self):
+        gravity = 0.01 * constants.GRAVITY_CONSTANT
+        rise = constants.ENEMY_JUMP_STRENGTH**2 / (2 * gravity)
+        air_frames = 2 * constants.ENEMY_JUMP_STRENGTH / gravity
+        height = int(rise // self.tile_size)
+        distance = max(1, int(air_frames * constants.ENEMY_SPEED // self.tile_size))
+        return height, distance
+
+    def column_clear(self, x, top, bottom):
+        for y in range(top, bottom + 1):
+            if (x, y) in self.solids:
+                return False
+        return True
+
+    def links_from(self, node):
+        x, y = node
+        links = []
+        for step in (-1, 1):
+            side = (x + step, y)
+            if side in self.nodes:
+                links.append((side, WALK))
+            elif side not in self.solids:
+                for drop in range(1, MAX_FALL_CELLS):
+                    below = (x + step, y + drop)
+                    if below in self.solids:
+                        break
+                    if below in self.nodes:
+                        links.append((below, FALL))
+                        break
+
+        height, distance = self.jump_reach()
+        if not self.column_clear(x, y - height, y):
+            return links
+        for dx in range(-distance, distance + 1):
+            for dy in range(-height, 1):
+                target = (x + dx, y + dy)
+                if target == node or target not in self.nodes:
+                    continue
+                if dy == 0 and abs(dx) == 1:
+                    continue
+                if self.column_clear(x + dx, y - height, y + dy):
+                    links.append((target, JUMP))
+        return links
+
+    def node_at(self, pos):
+        cell = (int(pos[0] // self.tile_size), int((pos[1] - 1) // self.tile_size))
+        for drop in range(MAX_FALL_CELLS):
+            below = (cell[0], cell[1] + drop)
+            if below in self.nodes:
+                return below
+            if below in self.solids:
+                return None
+        return None
+
+
+class FlowField:
+    def __init__(self, graph):
+        self.graph = graph
+        self.field = {}
+        self.target = None
+        self.building = {}
+        self.frontier = deque()
+
+    def reset(self):
+        self.field = {}
+        self.target = None
+        self.building = {}
+        self.frontier.clear()
+
+    def update(self, pos, budget=FLOW_FIELD_BUDGET):
+        target = self.graph.node_at(pos)
+        if target is not None and target != self.target:
+            self.target = target
+            self.building = {target: (None, WALK, 0)}
+            self.frontier = deque([target])
+
+        # spread the search over frames, keeping the last complete field live
+        while self.frontier and budget > 0:
+            budget -= 1
+            node = self.frontier.popleft()
+            distance = self.building[node][2] + 1
+            for source, kind in self.graph.incoming[node]:
+                if source not in self.building:
+                    self.building[source] = (node, kind, distance)
+                    self.frontier.append(source)
+
+        if not self.frontier and self.building:
+            self.field = self.building
+            self.building = {}
+
+    def sample(self, pos):
+        node = self.graph.node_at(pos)
+        if node is None or node not in self.field:
+            return None
+        next_node, kind, distance = self.field[node]
+        if next_node is None:
+            return 0, WALK, 0
+        dx = next_node[0] - node[0]
+        return (dx > 0) - (dx < 0), kind, distance
@@ -0,0 +1,52 @@
+import pygame
+
+from lib import renderer
+from lib.utils import load_image
+
+
+class ParallaxLayer:
+    def __init__(self, image, factor, view_size):
+        self.factor = factor
+        self.tile_width, self.tile_height = image.get_size()
+
+        # the image is tiled once into a strip one tile larger than the view,
+        # so any scroll position is covered by a single blit
+        columns = -(-view_size[0] // self.tile_width) + 1
+        rows = -(-view_size[1] // self.tile_height) + 1
+        strip = pygame.Surface(
+            (columns * self.tile_width, rows * self.tile_height),
+            image.get_flags() & pygame.SRCALPHA,
+        )
+        strip.fblits(
+            [
+                (image, (x * self.tile_width, y * self.tile_height))
+                for x in range(columns)
+                for y in range(rows)
+            ]
+        )
+        if image.get_flags() & pygame.SRCALPHA:
+            self.strip = strip.convert_alpha()
+        else:
+            self.strip = strip.convert()
+            self.strip.set_colorkey(image.get_colorkey())
+
+    def position(self, offset):
+        return (
+            -(int(offset[0] * self.factor) % self.tile_width),
+            -(int(offset[1] * self.factor) % self.tile_height),
+        )
+
+
+class ParallaxBackground:
+    def __init__(self, layers, view_size):
+        self.layers = [
+            ParallaxLayer(load_image(path), factor, view_size)
+            for path, factor in layers
+        ]
+
+    def render(self, queue, camera):
+        # one batch keeps the layers in back to front order
+        queue.submit_batch(
+            renderer.BACKGROUND,
+            [(layer.strip, layer.position(camera.offset)) for layer in self.layers],
+        )
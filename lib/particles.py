@@ -0,0 +1,176 @@
+import math
+
+import pygame
+
+from lib import constants, renderer
+
+# numpy takes longer to import than the rest of the game together, so it is
+# only pulled in once particles are needed
+np = None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy
+
+        np = numpy
+    return np
+
+
+EFFECTS = {
+    "dust": {
+        "colour": (130, 120, 110),
+        "count": 10,
+        "speed": 0.6,
+        "life": 25,
+        "gravity": -0.01,
+        "angle": (math.pi, 2 * math.pi),
+    },
+    "bone": {
+        "colour": (220, 215, 200),
+        "count": 40,
+        "speed": 2.0,
+        "life": 60,
+        "gravity": 0.08,
+        "angle": (math.pi, 2 * math.pi),
+    },
+    "hit": {
+        "colour": (170, 30, 30),
+        "count": 14,
+        "speed": 1.5,
+        "life": 20,
+        "gravity": 0.05,
+        "angle": (0, 2 * math.pi),
+    },
+    "slash": {
+        "colour": (235, 235, 255),
+        "count": 10,
+        "speed": 1.2,
+        "life": 12,
+        "gravity": 0,
+        "angle": (0, 2 * math.pi),
+    },
+}
+PARTICLE_SIZE = 2
+
+
+class ParticleSystem:
+    def __init__(self, capacity=constants.MAX_PARTICLES):
+        self.capacity = capacity
+        self.allocated = False
+        self.count = 0
+
+        self.effects = {}
+        self.colours = []
+        for name, effect in EFFECTS.items():
+            self.effects[name] = len(self.colours)
+            self.colours.append(effect["colour"])
+
+    def allocate(self):
+        if self.allocated:
+            return
+        load_numpy()
+        capacity = self.capacity
+        self.pos = np.zeros((capacity, 2), np.float32)
+        self.velocity = np.zeros((capacity, 2), np.float32)
+        self.gravity = np.zeros(capacity, np.float32)
+        self.life = np.zeros(capacity, np.float32)
+        self.colour = np.zeros(capacity, np.intp)
+        self.rng = np.random.default_rng()
+        self.allocated = True
+
+    def resize(self, capacity):
+        # live particles past the new capacity are dropped
+        self.capacity = capacity
+        if not self.allocated:
+            return
+        count = min(self.count, capacity)
+        arrays = (self.pos, self.velocity, self.gravity, self.life, self.colour)
+        self.allocated = False
+        self.allocate()
+        for new, old in zip(
+            (self.pos, self.velocity, self.gravity, self.life, self.colour), arrays
+        ):
+            new[:count] = old[:count]
+        self.count = count
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, name, pos, count=None):
+        self.allocate()
+        effect = EFFECTS[name]
+        if count is None:
+            count = effect["count"]
+        start = self.count
+        end = min(start + count, self.capacity)
+        n = end - start
+        if n <= 0:
+            return
+
+        angle = self.rng.uniform(*effect["angle"], n)
+        speed = self.rng.uniform(0.3, 1.0, n) * effect["speed"]
+        self.pos[start:end] = pos
+        self.velocity[start:end, 0] = np.cos(angle) * speed
+        self.velocity[start:end, 1] = np.sin(angle) * speed
+        self.gravity[start:end] = effect["gravity"]
+        self.life[start:end] = self.rng.uniform(0.5, 1.0, n) * effect["life"]
+        self.colour[start:end] = self.effects[name]
+        self.count = end
+
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+        self.velocity[:n, 1] += self.gravity[:n]
+        self.pos[:n] += self.velocity[:n]
+        self.life[:n] -= 1
+
+        # keep live particles packed at the front so every pass is one slice
+        alive = self.life[:n] > 0
+        live = int(np.count_nonzero(alive))
+        if live != n:
+            for array in (
+                self.pos,
+                self.velocity,
+                self.gravity,
+                self.life,
+                self.colour,
+            ):
+                array[:live] = array[:n][alive]
+            self.count = live
+
+    def render(self, queue, camera):
+        n = self.count
+        if n == 0:
+            return
+        screen = (self.pos[:n] - np.array(camera.offset, np.float32)).astype(np.int32)
+        colour = self.colour[:n]
+        queue.submit_draw(
+            renderer.EFFECTS, lambda target: self.draw(target, screen, colour)
+        )
+
+    def draw(self, target, screen, colour):
+        # every particle is a square of one colour, so they are written
+        # straight into the target's pixels rather than blitted one by one.
+        # Each particle's pixels stay together so later ones still cover
+        # earlier ones as blits would
+        width, height = target.get_size()
+        x = screen[:, 0]
+        y = screen[:, 1]
+        visible = (
+            (x > -PARTICLE_SIZE) & (x < width) & (y > -PARTICLE_SIZE) & (y < height)
+        )
+        palette = np.array([target.map_rgb(c) for c in self.colours], np.uint32)
+        values = palette[colour[visible]].repeat(PARTICLE_SIZE * PARTICLE_SIZE)
+        # a pixel of a square that hangs over the edge is clamped onto one
+        # the same square covers inside it, so nothing needs masking
+        dx, dy = np.divmod(
+            np.arange(PARTICLE_SIZE * PARTICLE_SIZE, dtype=np.int32), PARTICLE_SIZE
+        )
+        xs = (x[visible, None] + dx).ravel().clip(0, width - 1)
+        ys = (y[visible, None] + dy).ravel().clip(0, height - 1)
+        pixels = pygame.surfarray.pixels2d(target)
+        pixels[xs, ys] = values
+        del pixels
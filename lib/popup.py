@@ -1,29 +1,43 @@
+from functools import lru_cache
+
 import pygame
 
 from lib import utils
 
 
+@lru_cache
+def load_fonts(font_name):
+    pygame.font.init()
+    heading_font = pygame.font.Font(f"data/fonts/{font_name}", 50)
+    text_font = pygame.font.SysFont("Ubuntu Mono", 30)
+    return heading_font, text_font
+
+
 class PopupDialog:
     def __init__(self, game, title: str, message: str):
         self.game = game
         self.title = title
         self.message = message
+        self.font_name = "BreatheFire.ttf"
+        self.opaqueness = 150
+        self.rendered = False
+
+    def get_popup(self):
+        if self.rendered:
+            return self.display
+        self.rendered = True
+
+        # fonts and the surface are only set up the first time the popup is
+        # needed, which keeps them out of startup
         self.display = pygame.Surface(self.game.screen.get_size(), pygame.SRCALPHA, 32)
 
         self.display = self.display.convert_alpha()
 
-        pygame.font.init()
-        self.font_name = "BreatheFire.ttf"
-        self.heading_font = pygame.font.Font(f"data/fonts/{self.font_name}", 50)
-        self.text_font = pygame.font.SysFont("Ubuntu Mono", 30)
+        self.heading_font, self.text_font = load_fonts(self.font_name)
 
         self.player_img = utils.load_image("entities/player/idle/00.png")
         self.player_img = pygame.transform.scale_by(self.player_img, 6)
 
-        self.opaqueness = 150
-
-    def get_popup(self):
-
         self.display.fill((30, 30, 30, self.opaqueness))
 
         title_text_surface = self.heading_font.render(
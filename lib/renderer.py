@@ -0,0 +1,74 @@
+from operator import itemgetter
+
+BACKGROUND = 0
+TILES = 1
+OFFGRID = 2
+ENTITIES = 3
+EFFECTS = 4
+HUD = 5
+POPUPS = 6
+
+# grid tiles never overlap, so that layer is grouped by surface. Everything
+# else keeps the order it was submitted in, which the stable sort preserves
+GROUPED_LAYERS = {TILES}
+SORT_KEY = itemgetter(0, 1)
+
+
+class RenderQueue:
+    def __init__(self):
+        self.commands = []
+        self.batches = []
+        self.submitted = 0
+        self.draw_calls = 0
+
+    def submit(self, layer, surf, pos, scroll=1):
+        # pos is in world space, scroll is how much of the camera offset
+        # applies (0 pins it to the screen)
+        group = id(surf) if layer in GROUPED_LAYERS else 0
+        self.commands.append((layer, group, surf, pos[0], pos[1], scroll))
+
+    def submit_batch(self, layer, blits):
+        # blits are (surface, screen position) pairs that are already culled
+        self.batches.append((layer, blits))
+
+    def submit_draw(self, layer, draw):
+        # draw(target) is called in its layer's turn, for things that write
+        # to the target themselves instead of blitting surfaces
+        self.batches.append((layer, draw))
+
+    def flush(self, target, offset=(0, 0)):
+        self.commands.sort(key=SORT_KEY)
+        width, height = target.get_size()
+        offset_x, offset_y = offset
+
+        layers = {}
+        current = None
+        blits = None
+        for layer, _, surf, x, y, scroll in self.commands:
+            x -= offset_x * scroll
+            y -= offset_y * scroll
+            if x >= width or y >= height:
+                continue
+            if x + surf.get_width() <= 0 or y + surf.get_height() <= 0:
+                continue
+            if layer != current:
+                current = layer
+                blits = []
+                layers[layer] = [blits]
+            blits.append((surf, (x, y)))
+        for layer, batch in self.batches:
+            layers.setdefault(layer, []).append(batch)
+
+        draw_calls = 0
+        for layer in sorted(layers):
+            for blits in layers[layer]:
+                if callable(blits):
+                    blits(target)
+                else:
+                    target.fblits(blits)
+                draw_calls += 1
+
+        self.submitted = len(self.commands)
+        self.draw_calls = draw_calls
+        self.commands.clear()
+        self.batches.clear()
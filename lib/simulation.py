@@ -0,0 +1,284 @@
+import os
+import threading
+from functools import lru_cache
+
+import pygame
+
+from lib import constants
+from lib.animation import Animator, Clip
+from lib.entities import Skeleton
+from lib.levels import read_level
+from lib.navigation import NAVIGATION_CONSTANTS, NavGraph
+from lib.snapshot import Snapshot
+from lib.tilemap import Tilemap
+from lib.utils import BASE_IMG_PATH
+
+CLIP_ASSETS = {
+    "player/idle": "entities/player/idle",
+    "player/run": "entities/player/run",
+    "player/turn_around": "entities/player/turn_around",
+    "player/jump": "entities/player/jump",
+    "player/death": "entities/player/death",
+    "player/fall": "entities/player/fall",
+    "player/attack": "entities/player/attack",
+    "player/attack_nomovement": "entities/player/attack_nomovement",
+    "skeleton/attack": "entities/skeleton/attack",
+    "skeleton/death": "entities/skeleton/death",
+    "skeleton/hit": "entities/skeleton/hit",
+    "skeleton/idle": "entities/skeleton/idle",
+    "skeleton/walk": "entities/skeleton/walk",
+}
+
+
+@lru_cache(maxsize=None)
+def frame_clips():
+    # clips with the same frame counts as the real ones but no images, so
+    # animation state plays out the same without loading anything
+    return {
+        name: Clip([None] * len(os.listdir(BASE_IMG_PATH + path)))
+        for name, path in CLIP_ASSETS.items()
+    }
+
+
+class NullParticles:
+    # particles never affect gameplay, so headless worlds skip them
+    count = 0
+
+    def emit(self, name, pos, count=None):
+        pass
+
+    def update(self):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LevelData:
+    # everything about a level that the world only reads, built once and
+    # shared by every world playing it
+    def __init__(self, level):
+        self.level = level
+        self.tilemap = Tilemap(None)
+        self.tilemap.load_grid(level.grid)
+        self.navigation = NavGraph(self.tilemap)
+
+
+class LevelCache:
+    def __init__(self):
+        self.levels = {}
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        # the navigation graph depends on some constants, so worlds that
+        # override them get their own copy
+        key = (path,) + tuple(
+            getattr(constants, name) for name in sorted(NAVIGATION_CONSTANTS)
+        )
+        with self.lock:
+            if key not in self.data:
+                if path not in self.levels:
+                    self.levels[path] = read_level(path)
+                self.data[key] = LevelData(self.levels[path])
+            return self.data[key]
+
+
+class LevelSequence:
+    # stands in for LevelManager, a requested level is handed over on the
+    # next tick instead of whenever a thread has read it, so runs repeat
+    def __init__(self, paths, cache):
+        self.paths = list(paths)
+        self.cache = cache
+        self.index = 0
+        self.pending = None
+
+    def load(self, index):
+        self.index = index
+        self.pending = None
+        return self.cache.get(self.paths[index]).level
+
+    def request(self, index):
+        if 0 <= index < len(self.paths) and index != self.pending:
+            self.pending = index
+
+    def poll(self):
+        if self.pending is None:
+            return None
+        return self.load(self.pending)
+
+
+class World:
+    """Game state and rules without a window.
+
+    Game draws it and feeds it input, the headless simulation runs many of
+    them side by side. Subclasses own the map: load_map sets up tilemap,
+    navigation and flow_field for a level.
+    """
+
+    def __init__(self, assets, particles, levels):
+        self.view_size = (
+            constants.RESOLUTION[0] / constants.SCALING_FACTOR,
+            constants.RESOLUTION[1] / constants.SCALING_FACTOR,
+        )
+        self.movement = [False, False]
+
+        self.assets = assets
+        self.animator = Animator(self.assets)
+        self.particles = particles
+
+        self.skeletons = []
+        self.skeleton_pool = []
+        self.player_collision_detectors = []
+        self.player_collision_rects = []
+
+        self.levels = levels
+        self.heart_grow_animation_time = 0
+        self.popup_index = -1
+
+    def start_level(self, level):
+        self.level = level
+        self.load_map(level)
+        self.particles.clear()
+        self.load_triggers(level)
+        self.checkpoints_reached = set()
+        if level.spawners["player_spawner"]:
+            self.player.respawn_pos = list(level.spawners["player_spawner"][-1]["pos"])
+        self.spawn_skeletons(level)
+        self.setup()
+        self.level_start = Snapshot(self)
+        self.checkpoint = self.level_start
+
+    def load_triggers(self, level):
+        self.player_collision_detectors = level.spawners["player_collision_detector"]
+        self.player_collision_rects = [
+            pygame.Rect(tile["pos"][0], tile["pos"][1], 10, 10)
+            for tile in self.player_collision_detectors
+        ]
+        self.level_exits = [
+            pygame.Rect(tile["pos"][0], tile["pos"][1], 10, 10)
+            for tile in level.spawners["level_exit"]
+        ]
+        self.checkpoints = [
+            pygame.Rect(tile["pos"][0], tile["pos"][1], 10, 10)
+            for tile in level.spawners["checkpoint"]
+        ]
+
+    def spawn_skeletons(self, level):
+        for skeleton in self.skeleton_pool:
+            self.animator.remove(skeleton.slot)
+        self.skeleton_pool = [
+            Skeleton(self, tile["pos"], (15, 30))
+            for tile in level.spawners["skeleton_spawner"]
+        ]
+
+    def setup(self):
+        self.player.pos = self.player.respawn_pos.copy()
+        self.revive()
+        self.skeletons[:] = self.skeleton_pool
+
+    def revive(self):
+        self.player.dead = False
+        self.player.health = 60
+        self.player.time_since_death = 0
+
+    def respawn(self):
+        # a checkpoint keeps where the player and skeletons were, but every
+        # respawn starts at full health as it did before checkpoints
+        self.checkpoint.restore(self)
+        self.revive()
+
+    def retry(self):
+        self.checkpoints_reached.clear()
+        self.checkpoint = self.level_start
+        self.respawn()
+
+    def handle_event(self, event):
+        """Handle Input"""
+        if self.popup_index == -1:
+            if event.type == pygame.KEYDOWN:
+                if not self.player.dead:
+                    if event.key == pygame.K_a:
+                        self.movement[0] = True
+                    if event.key == pygame.K_d:
+                        self.movement[1] = True
+
+                if event.key == pygame.K_w or event.key == pygame.K_SPACE:
+                    if self.player.air_time < 5:
+                        self.player.velocity[1] = -constants.JUMP_STRENGTH * (
+                            1
+                            if not self.player.sprinting
+                            else constants.SPRINT_JUMP_HEIGHT_MULTIPLIER
+                        )
+
+                if event.key == pygame.K_LSHIFT:
+                    if self.player.air_time < 5:
+                        self.player.sprinting = False
+
+                if event.key == pygame.K_r:
+                    self.retry()
+
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_a:
+                    self.movement[0] = False
+                if event.key == pygame.K_d:
+                    self.movement[1] = False
+                if event.key == pygame.K_LSHIFT:
+                    self.player.sprinting = False
+
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                if event.button == 1 and self.player.attack_cooldown == 0:
+                    self.player.attack_cooldown = constants.ATTACK_COOLDOWN * 60
+                    self.player.set_action("jump")
+
+                    if self.player.pos[0] > 2330 and (
+                        self.player.action != "attack"
+                        and self.player.action != "attack_nomovement"
+                    ):
+                        self.popup_index = 3
+                    # else:
+                    #     self.player.set_action("attack_nomovement")
+        else:
+            self.movement = [0, 0]
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_RETURN:
+                    self.player.has_hit_collider = False
+                    self.player.time_since_collision = 0
+                    self.popup_index = -1
+
+    def step(self, events):
+        level = self.levels.poll()
+        if level is not None:
+            self.start_level(level)
+
+        self.flow_field.update(self.player.rect().midbottom)
+
+        self.player.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
+
+        for i in range(len(self.skeletons) - 1, -1, -1):
+            skeleton = self.skeletons[i]
+            skeleton.update(self.tilemap)
+            if skeleton.time_since_death >= 15 * 5 - 2:
+                self.skeletons.pop(i)
+
+        self.animator.advance()
+        self.particles.update()
+
+        for i, rect in enumerate(self.checkpoints):
+            if i not in self.checkpoints_reached and not self.player.dead:
+                if self.player.rect().colliderect(rect):
+                    self.checkpoints_reached.add(i)
+                    self.checkpoint = Snapshot(self, self.checkpoint)
+
+        for rect in self.level_exits:
+            if self.player.rect().colliderect(rect):
+                self.levels.request(self.levels.index + 1)
+
+        for event in events:
+            self.handle_event(event)
+
+        if self.player.dead and (
+            self.player.time_since_death >= 10 * 5
+            or self.player.pos[1] > self.view_size[1]
+        ):
+            self.respawn()
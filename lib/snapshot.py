@@ -0,0 +1,72 @@
+LIST_FIELDS = ("pos", "velocity", "anim_offset")
+ENTITY_FIELDS = (
+    "size",
+    "flip",
+    "action",
+    "health",
+    "dead",
+    "time_since_damage",
+    "time_since_death",
+)
+PLAYER_LIST_FIELDS = LIST_FIELDS + ("respawn_pos",)
+PLAYER_FIELDS = ENTITY_FIELDS + (
+    "air_time",
+    "attack_time",
+    "attack_cooldown",
+    "turn_around_time",
+    "sprinting",
+    "time_since_collision",
+    "has_hit_collider",
+)
+
+
+def capture(entity, list_fields, fields):
+    animator = entity.game.animator
+    return (
+        tuple(tuple(getattr(entity, name)) for name in list_fields)
+        + tuple(getattr(entity, name) for name in fields)
+        + (animator.clips[entity.slot], animator.cursors[entity.slot])
+    )
+
+
+def restore(entity, record, list_fields, fields):
+    # lists are written in place and the rest are shared immutable values, so
+    # restoring allocates nothing
+    for i in range(len(list_fields)):
+        getattr(entity, list_fields[i])[:] = record[i]
+    offset = len(list_fields)
+    for i in range(len(fields)):
+        setattr(entity, fields[i], record[offset + i])
+    entity.game.animator.clips[entity.slot] = record[-2]
+    entity.game.animator.cursors[entity.slot] = record[-1]
+
+
+class Snapshot:
+    def __init__(self, game, previous=None):
+        self.player = capture(game.player, PLAYER_LIST_FIELDS, PLAYER_FIELDS)
+        self.skeletons = tuple(game.skeletons)
+        self.records = {}
+        for skeleton in self.skeletons:
+            record = capture(skeleton, LIST_FIELDS, ENTITY_FIELDS)
+            # records are immutable, so one that didn't change since the
+            # previous snapshot is shared with it instead of kept twice
+            if previous is not None and previous.records.get(skeleton) == record:
+                record = previous.records[skeleton]
+            self.records[skeleton] = record
+        self.heart_grow_animation_time = game.heart_grow_animation_time
+
+    def restore(self, game):
+        restore(game.player, self.player, PLAYER_LIST_FIELDS, PLAYER_FIELDS)
+        game.skeletons[:] = self.skeletons
+        for skeleton in self.skeletons:
+            restore(skeleton, self.records[skeleton], LIST_FIELDS, ENTITY_FIELDS)
+        game.heart_grow_animation_time = self.heart_grow_animation_time
+
+    def replace_skeletons(self, skeletons):
+        # used when the level is edited while playing, the player's record
+        # stays and restoring brings back the new skeletons
+        self.skeletons = tuple(skeletons)
+        self.records = {
+            skeleton: capture(skeleton, LIST_FIELDS, ENTITY_FIELDS)
+            for skeleton in self.skeletons
+        }
@@ -0,0 +1,73 @@
+import time
+from collections import deque
+
+# imported before pygame so the timeline starts as early as we can measure
+STARTED = time.perf_counter()
+
+
+class StartupTrace:
+    def __init__(self, enabled=False, budget=None):
+        self.enabled = enabled
+        self.budget = budget
+        self.last = STARTED
+        self.stages = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.stages.append((name, now - self.last, now - STARTED))
+        if self.enabled:
+            print(
+                f"{(now - STARTED) * 1000:8.1f}ms"
+                f"  +{(now - self.last) * 1000:7.1f}ms  {name}"
+            )
+        self.last = now
+
+    def check(self, name):
+        # warns when a milestone lands later than the budget in milliseconds
+        for stage, _, elapsed in self.stages:
+            if stage == name and self.enabled and self.budget is not None:
+                if elapsed * 1000 > self.budget:
+                    print(
+                        f"{name} took {elapsed * 1000:.1f}ms,"
+                        f" over the {self.budget}ms budget"
+                    )
+
+
+class Startup:
+    def __init__(self, trace):
+        self.trace = trace
+        self.stages = deque()
+        self.total = 0
+
+    def add(self, name, stage):
+        self.stages.append((name, stage))
+        self.total += 1
+
+    @property
+    def done(self):
+        return not self.stages
+
+    @property
+    def progress(self):
+        return 1 - len(self.stages) / self.total if self.total else 1.0
+
+    def advance(self, budget):
+        # runs stages until the frame's budget in seconds is spent, always at
+        # least one so startup can't stall behind a slow stage. A stage that
+        # returns False is waiting on a thread and is tried again next frame
+        deadline = time.perf_counter() + budget
+        while self.stages:
+            name, stage = self.stages[0]
+            if stage() is False:
+                break
+            self.stages.popleft()
+            self.trace.mark(name)
+            if time.perf_counter() >= deadline:
+                break
+
+    def finish(self):
+        while True:
+            self.advance(float("inf"))
+            if self.done:
+                break
+            time.sleep(0.001)
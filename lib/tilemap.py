@@ -1,6 +1,10 @@
-import json
+import threading
+from array import array
+
 import pygame
 
+from lib import renderer
+
 NEIGHBOR_OFFSETS = [
     (0, -2),
     (0, 2),
@@ -21,94 +25,314 @@ NON_RENDER_TILES = {
     "player_spawner",
     "skeleton_path_mirror",
     "player_collision_detector",
+    "level_exit",
+    "checkpoint",
 }
 
 
+# tile types are interned to small ids the first time they are seen, with
+# id 0 standing for an empty cell, so the per tile properties are plain
+# table lookups instead of set membership tests on strings
+TILE_TYPES = [None]
+TYPE_IDS = {}
+SOLID = bytearray(1)
+HALF = bytearray(1)
+RENDERED = bytearray(1)
+# maps are read on background threads, which intern new types as well
+TYPES_LOCK = threading.Lock()
+
+
+def type_id(name):
+    if name not in TYPE_IDS:
+        with TYPES_LOCK:
+            if name not in TYPE_IDS:
+                if len(TILE_TYPES) > 255:
+                    raise ValueError("too many tile types")
+                # the main thread reads these without the lock and sizes
+                # its tables by TILE_TYPES, so the name goes in last
+                SOLID.append(name in PHYSICS_TILES)
+                HALF.append(name in HALF_TILES)
+                RENDERED.append(name not in NON_RENDER_TILES)
+                TYPE_IDS[name] = len(TILE_TYPES)
+                TILE_TYPES.append(name)
+    return TYPE_IDS[name]
+
+
+class TileGrid:
+    # a whole map in the tilemap's own layout. Loads build one on a
+    # background thread and saves work on a copy of one, so the main thread
+    # only ever swaps or copies the arrays
+    def __init__(
+        self,
+        tile_size=32,
+        x0=0,
+        y0=0,
+        width=0,
+        height=0,
+        types=b"",
+        variants=b"",
+        offgrid=(),
+    ):
+        self.tile_size = tile_size
+        self.x0 = x0
+        self.y0 = y0
+        self.width = width
+        self.height = height
+        self.types = types
+        self.variants = variants
+        self.offgrid = offgrid
+
+
+class GridBuilder:
+    # collects tiles into flat arrays as they are read, and lays them out
+    # once the extent of the map is known
+    def __init__(self):
+        self.xs = array("l")
+        self.ys = array("l")
+        self.types = bytearray()
+        self.variants = bytearray()
+        self.offgrid = []
+
+    def add_tile(self, name, variant, pos):
+        self.xs.append(int(pos[0]))
+        self.ys.append(int(pos[1]))
+        self.types.append(type_id(name))
+        self.variants.append(variant)
+
+    def add_offgrid(self, name, variant, pos):
+        self.offgrid.append((type_id(name), variant, pos[0], pos[1]))
+
+    def finish(self, tile_size):
+        if not self.xs:
+            return TileGrid(tile_size, offgrid=self.offgrid)
+        x0 = min(self.xs)
+        y0 = min(self.ys)
+        width = max(self.xs) - x0 + 1
+        height = max(self.ys) - y0 + 1
+        types = bytearray(width * height)
+        variants = bytearray(width * height)
+        for x, y, tile, variant in zip(self.xs, self.ys, self.types, self.variants):
+            index = (y - y0) * width + x - x0
+            types[index] = tile
+            variants[index] = variant
+        return TileGrid(tile_size, x0, y0, width, height, types, variants, self.offgrid)
+
+
 class Tilemap:
     def __init__(self, game, tile_size=32):
         self.game = game
         self.tile_size = tile_size
-        self.tilemap = {}
+        self.images = []
+        self.drawable = bytearray()
+        self.clear()
+
+    def clear(self):
+        # grid tiles live in two dense byte arrays, one for the type id and
+        # one for the variant, covering the cells from (x0, y0)
+        self.x0 = 0
+        self.y0 = 0
+        self.width = 0
+        self.height = 0
+        self.types = bytearray()
+        self.variants = bytearray()
+        # offgrid tiles are (type id, variant, x, y) records
         self.offgrid_tiles = []
 
-    def save(self, path):
-        f = open(path, "w")
-        json.dump(
-            {
-                "tilemap": self.tilemap,
-                "tile_size": self.tile_size,
-                "offgrid": self.offgrid_tiles,
-            },
-            f,
+    def grid(self):
+        # a copy a background save can work on while the map keeps changing
+        return TileGrid(
+            self.tile_size,
+            self.x0,
+            self.y0,
+            self.width,
+            self.height,
+            bytes(self.types),
+            bytes(self.variants),
+            list(self.offgrid_tiles),
         )
-        f.close()
-
-    def load(self, path):
-        f = open(path, "r")
-        map_data = json.load(f)
-        f.close()
-
-        self.tilemap = map_data["tilemap"]
-        self.tile_size = map_data["tile_size"]
-        self.offgrid_tiles = map_data["offgrid"]
-        # print(self.offgrid_tiles)
-
-    def tiles_around(self, pos):
-        tiles = []
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
-        for offset in NEIGHBOR_OFFSETS:
-            check_loc = (
-                str(tile_loc[0] + offset[0]) + ";" + str(tile_loc[1] + offset[1])
-            )
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
-        return tiles
+
+    def load_grid(self, grid):
+        # grids can be shared by several tilemaps, so the arrays are copied,
+        # which is a memcpy rather than a pass over the tiles
+        self.tile_size = grid.tile_size
+        self.x0 = grid.x0
+        self.y0 = grid.y0
+        self.width = grid.width
+        self.height = grid.height
+        self.types = bytearray(grid.types)
+        self.variants = bytearray(grid.variants)
+        self.offgrid_tiles = list(grid.offgrid)
+
+    def update_grid(self, grid):
+        # swaps in an edited map and reports whether the grid changed, so
+        # callers only rebuild what depends on it
+        changed = (self.x0, self.y0, self.width, self.types, self.variants) != (
+            grid.x0,
+            grid.y0,
+            grid.width,
+            grid.types,
+            grid.variants,
+        )
+        self.load_grid(grid)
+        return changed
+
+    def reserve(self, left, top, right, bottom):
+        # grows the grid so it covers the given cells, keeping existing tiles
+        if self.width:
+            left = min(left, self.x0)
+            top = min(top, self.y0)
+            right = max(right, self.x0 + self.width - 1)
+            bottom = max(bottom, self.y0 + self.height - 1)
+        width = right - left + 1
+        height = bottom - top + 1
+        if (left, top, width, height) == (self.x0, self.y0, self.width, self.height):
+            return
+        types = bytearray(width * height)
+        variants = bytearray(width * height)
+        for row in range(self.height):
+            start = (self.y0 + row - top) * width + self.x0 - left
+            types[start : start + self.width] = self.types[
+                row * self.width : (row + 1) * self.width
+            ]
+            variants[start : start + self.width] = self.variants[
+                row * self.width : (row + 1) * self.width
+            ]
+        self.x0, self.y0, self.width, self.height = left, top, width, height
+        self.types = types
+        self.variants = variants
+
+    def index(self, x, y):
+        x -= self.x0
+        y -= self.y0
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return -1
+
+    def tile_at(self, x, y):
+        index = self.index(x, y)
+        if index < 0 or not self.types[index]:
+            return None
+        return TILE_TYPES[self.types[index]], self.variants[index]
+
+    def set_tile(self, x, y, name, variant):
+        if self.index(x, y) < 0:
+            self.reserve(x, y, x, y)
+        index = self.index(x, y)
+        self.types[index] = type_id(name)
+        self.variants[index] = variant
+
+    def remove_tile(self, x, y):
+        index = self.index(x, y)
+        if index >= 0:
+            self.types[index] = 0
+            self.variants[index] = 0
+
+    def add_offgrid(self, name, variant, pos):
+        self.offgrid_tiles.append((type_id(name), variant, pos[0], pos[1]))
+
+    def remove_offgrid(self, tile):
+        self.offgrid_tiles.remove(tile)
+
+    def offgrid_positions(self, name):
+        tile_id = TYPE_IDS.get(name)
+        return [(x, y) for tile, _, x, y in self.offgrid_tiles if tile == tile_id]
+
+    def tiles(self):
+        types = self.types
+        for index in range(len(types)):
+            if types[index]:
+                y, x = divmod(index, self.width)
+                yield x + self.x0, y + self.y0, types[index], self.variants[index]
+
+    def bounds(self):
+        # the smallest (left, top, right, bottom) cell range holding tiles,
+        # the grid itself may be larger after tiles are removed. Each row is
+        # stripped of empty cells instead of visiting them one by one
+        width = self.width
+        left = width
+        right = top = bottom = -1
+        for row in range(self.height):
+            cells = self.types[row * width : (row + 1) * width]
+            filled = cells.rstrip(b"\0")
+            if not filled:
+                continue
+            left = min(left, len(filled) - len(filled.lstrip(b"\0")))
+            right = max(right, len(filled) - 1)
+            if top < 0:
+                top = row
+            bottom = row
+        if top < 0:
+            return None
+        return left + self.x0, top + self.y0, right + self.x0, bottom + self.y0
 
     def physics_rects_around(self, pos):
         # pos = self.game.player.rect().center
         rects = []
-        for tile in self.tiles_around(pos):
-            if tile["type"] in PHYSICS_TILES:
-                rects.append(
-                    pygame.Rect(
-                        tile["pos"][0] * self.tile_size,
-                        tile["pos"][1] * self.tile_size,
-                        self.tile_size,
-                        (
-                            self.tile_size * 1
-                            if tile["type"] not in HALF_TILES
-                            else self.tile_size * 0.5
-                        ),
+        tile_size = self.tile_size
+        tile_x = int(pos[0] // tile_size)
+        tile_y = int(pos[1] // tile_size)
+        # every entity calls this twice a tick, so the grid lookup is inlined
+        # instead of going through index()
+        types = self.types
+        width = self.width
+        height = self.height
+        left = tile_x - self.x0
+        top = tile_y - self.y0
+        for offset_x, offset_y in NEIGHBOR_OFFSETS:
+            x = left + offset_x
+            y = top + offset_y
+            if 0 <= x < width and 0 <= y < height:
+                tile = types[y * width + x]
+                if SOLID[tile]:
+                    rects.append(
+                        pygame.Rect(
+                            (tile_x + offset_x) * tile_size,
+                            (tile_y + offset_y) * tile_size,
+                            tile_size,
+                            tile_size * 0.5 if HALF[tile] else tile_size,
+                        )
                     )
-                )
         return rects
 
-    def render(self, surf, offset=(0, 0)):
-        for x in range(
-            offset[0] // self.tile_size,
-            (offset[0] + surf.get_width()) // self.tile_size + 1,
-        ):
-            for y in range(
-                offset[1] // self.tile_size,
-                (offset[1] + surf.get_height()) // self.tile_size + 1,
-            ):
-                loc = str(x) + ";" + str(y)
-                if loc in self.tilemap:
-                    tile = self.tilemap[loc]
-                    if tile["type"] == "skeleton_path_mirror":
-                        continue
-                    surf.blit(
-                        self.game.assets[tile["type"]][tile["variant"]],
-                        (
-                            tile["pos"][0] * self.tile_size - offset[0],
-                            tile["pos"][1] * self.tile_size - offset[1],
-                        ),
-                    )
+    def reset_images(self):
+        self.images.clear()
+        self.drawable.clear()
+
+    def sync_images(self):
+        # id to surface table, filled in as new types get interned. Types
+        # whose images haven't loaded yet are left out of drawable until the
+        # table is cleared and rebuilt
+        for tile, name in enumerate(TILE_TYPES[len(self.images) :], len(self.images)):
+            images = None
+            if name is not None and RENDERED[tile]:
+                images = self.game.assets.get(name)
+            self.images.append(images)
+            self.drawable.append(images is not None)
 
-        for tile in self.offgrid_tiles:
-            if tile["type"] in NON_RENDER_TILES:
+    def render(self, queue, camera):
+        if len(self.images) < len(TILE_TYPES):
+            self.sync_images()
+        images = self.images
+        drawable = self.drawable
+        types = self.types
+        variants = self.variants
+        tile_size = self.tile_size
+        left = max(camera.columns.start, self.x0)
+        right = min(camera.columns.stop, self.x0 + self.width)
+        for y in camera.rows:
+            row = y - self.y0
+            if not 0 <= row < self.height:
                 continue
-            surf.blit(
-                self.game.assets[tile["type"]][tile["variant"]],
-                (tile["pos"][0] - offset[0], tile["pos"][1] - offset[1]),
-            )
+            base = row * self.width - self.x0
+            for x in range(left, right):
+                tile = types[base + x]
+                if drawable[tile]:
+                    queue.submit(
+                        renderer.TILES,
+                        images[tile][variants[base + x]],
+                        (x * tile_size, y * tile_size),
+                    )
+
+        for tile, variant, x, y in self.offgrid_tiles:
+            if drawable[tile]:
+                queue.submit(renderer.OFFGRID, images[tile][variant], (x, y))
@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import time
+
+from simulate import make_jobs, run
+
+
+def summarise(results):
+    table = {}
+    for result in results:
+        key = json.dumps(result["config"], sort_keys=True)
+        row = table.setdefault(
+            key,
+            {
+                "config": result["config"],
+                "runs": 0,
+                "reached": 0,
+                "deaths": 0,
+                "best_time": None,
+                "max_x": 0,
+                "gates": set(),
+            },
+        )
+        row["runs"] += 1
+        row["deaths"] += result["deaths"]
+        row["max_x"] = max(row["max_x"], result["max_x"])
+        row["gates"].update(result["gates"])
+        if result["reached_goal"]:
+            row["reached"] += 1
+            if row["best_time"] is None or result["completion_time"] < row["best_time"]:
+                row["best_time"] = result["completion_time"]
+    for row in table.values():
+        row["gates"] = sorted(row["gates"])
+    return list(table.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless batch playtests")
+    parser.add_argument("--level", action="append", default=[])
+    parser.add_argument("--script", action="append", default=[])
+    parser.add_argument("--random", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--goal-x", type=float, default=None)
+    parser.add_argument("--sweep", action="append", default=[])
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    jobs = make_jobs(args)
+    start = time.perf_counter()
+    results = run(jobs, processes=args.processes)
+    elapsed = time.perf_counter() - start
+
+    for row in summarise(results):
+        best = "-" if row["best_time"] is None else f"{row['best_time']:.2f}s"
+        print(
+            f"{json.dumps(row['config'])}: reached {row['reached']}/{row['runs']}"
+            f", deaths {row['deaths']}, best {best}, max x {row['max_x']}"
+            f", gates {row['gates']}"
+        )
+    simulated = sum(result["ticks"] for result in results)
+    print(
+        f"{len(jobs)} runs, {simulated} frames in {elapsed:.2f}s"
+        f" on {args.processes} processes ({simulated / elapsed:.0f} frames/s)"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
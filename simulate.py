@@ -0,0 +1,312 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pygame
+
+import lib.constants as constants
+from lib.entities import Player
+from lib.navigation import FlowField
+from lib.simulation import LevelCache, LevelSequence, NullParticles, World, frame_clips
+
+KEYS = {
+    "left": "K_a",
+    "right": "K_d",
+    "jump": "K_SPACE",
+    "sprint": "K_LSHIFT",
+}
+FPS = 60
+ENTER = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN)
+DEFAULTS = {name: getattr(constants, name) for name in dir(constants) if name.isupper()}
+
+# level data is only read while playing, so every game in the process shares
+# it, and process pool workers inherit what was built before they started
+levels = LevelCache()
+
+
+def configure(overrides):
+    for name, value in DEFAULTS.items():
+        setattr(constants, name, value)
+    for name, value in overrides.items():
+        setattr(constants, name, value)
+
+
+def random_script(seed, seconds):
+    rng = random.Random(seed)
+    script = []
+    frames = 0
+    while frames < seconds * FPS:
+        held = ["right"] if rng.random() < 0.8 else ["left"]
+        if rng.random() < 0.5:
+            held.append("sprint")
+        if rng.random() < 0.4:
+            held.append("jump")
+        if rng.random() < 0.2:
+            held.append("attack")
+        duration = rng.randint(5, 90)
+        script.append({"frames": duration, "keys": held})
+        frames += duration
+    return script
+
+
+def events_for(held, keys):
+    events = []
+    for key in held - keys:
+        if key == "attack":
+            events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, button=1))
+        else:
+            events.append(
+                pygame.event.Event(pygame.KEYUP, key=getattr(pygame, KEYS[key]))
+            )
+    for key in keys - held:
+        if key == "attack":
+            events.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1))
+        else:
+            events.append(
+                pygame.event.Event(pygame.KEYDOWN, key=getattr(pygame, KEYS[key]))
+            )
+    return events
+
+
+def parse_sweep(values):
+    names = []
+    options = []
+    for value in values:
+        name, _, choices = value.partition("=")
+        names.append(name)
+        options.append([float(choice) for choice in choices.split(",")])
+    return [dict(zip(names, combo)) for combo in itertools.product(*options)]
+
+
+def default_goal(path):
+    graph = levels.get(path).navigation
+    return (max(node[0] for node in graph.nodes) - 1) * graph.tile_size
+
+
+class HeadlessGame(World):
+    def __init__(self, job):
+        super().__init__(
+            frame_clips(), NullParticles(), LevelSequence(job["levels"], levels)
+        )
+        self.job = job
+        self.script = itertools.cycle(job["script"])
+        self.held = set()
+        self.events = []
+        self.remaining = 0
+
+        self.ticks = 0
+        self.deaths = 0
+        self.gates = set()
+        self.completed = None
+        self.finished = False
+
+        self.player = Player(self, (2000, 150), (15, 30))
+        self.start_level(self.levels.load(0))
+        self.max_x = self.player.pos[0]
+
+    def load_map(self, level):
+        data = self.levels.cache.get(level.path)
+        self.tilemap = data.tilemap
+        self.navigation = data.navigation
+        self.flow_field = FlowField(data.navigation)
+
+    def tick(self):
+        while self.remaining <= 0:
+            segment = next(self.script)
+            keys = set(segment["keys"])
+            self.events = events_for(self.held, keys)
+            self.held = keys
+            self.remaining = segment["frames"]
+        self.remaining -= 1
+
+        events = self.events
+        self.events = []
+        if self.popup_index != -1:
+            self.gates.add(self.popup_index)
+            events.append(ENTER)
+
+        was_dead = self.player.dead
+        self.step(events)
+        self.ticks += 1
+        if self.player.dead and not was_dead:
+            self.deaths += 1
+        self.max_x = max(self.max_x, self.player.pos[0])
+        if self.player.pos[0] >= self.job["goal_x"]:
+            self.completed = self.ticks
+        self.finished = (
+            self.completed is not None or self.ticks >= self.job["max_ticks"]
+        )
+
+    def digest(self):
+        # a checksum of the final state, equal whenever the same job is run
+        state = [
+            (entity.pos, entity.velocity, entity.health, entity.action, entity.dead)
+            for entity in [self.player] + self.skeletons
+        ]
+        state.append(self.animator.cursors)
+        return format(zlib.crc32(repr(state).encode()), "08x")
+
+    def stats(self):
+        return {
+            "config": self.job["config"],
+            "levels": self.job["levels"],
+            "script": self.job["name"],
+            "reached_goal": self.completed is not None,
+            "completion_time": None if self.completed is None else self.completed / FPS,
+            "deaths": self.deaths,
+            "gates": sorted(self.gates),
+            "max_x": round(self.max_x, 1),
+            "level": self.levels.index,
+            "ticks": self.ticks,
+            "state": self.digest(),
+        }
+
+
+class SimulationServer:
+    """Steps many headless games in lockstep inside one process."""
+
+    def __init__(self, jobs=()):
+        self.games = []
+        self.groups = {}
+        for job in jobs:
+            self.add(job)
+
+    def add(self, job):
+        configure(job["config"])
+        game = HeadlessGame(job)
+        self.games.append(game)
+        key = json.dumps(job["config"], sort_keys=True)
+        self.groups.setdefault(key, (job["config"], []))[1].append(game)
+        return game
+
+    def active(self):
+        return any(games for _, games in self.groups.values())
+
+    def step(self, ticks=1):
+        # constants are module globals, so the games sharing a config are
+        # stepped together between switching them
+        for config, games in self.groups.values():
+            if not games:
+                continue
+            configure(config)
+            for _ in range(ticks):
+                for game in games:
+                    if not game.finished:
+                        game.tick()
+            games[:] = [game for game in games if not game.finished]
+
+    def stats(self):
+        return [game.stats() for game in self.games]
+
+
+def run_shard(jobs, batch=FPS):
+    server = SimulationServer(jobs)
+    while server.active():
+        server.step(batch)
+    return server.stats()
+
+
+def run(jobs, processes=0, threads=0, batch=FPS):
+    configs = {json.dumps(job["config"], sort_keys=True) for job in jobs}
+    if threads and len(configs) > 1:
+        raise ValueError(
+            "threads share lib.constants, use processes to run several configs"
+        )
+    for job in jobs:
+        configure(job["config"])
+        for path in job["levels"]:
+            levels.get(path)
+    configure({})
+
+    workers = max(processes, threads, 1)
+    if workers == 1:
+        stats = run_shard(jobs, batch)
+    else:
+        executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        shards = [jobs[i::workers] for i in range(workers)]
+        with executor(workers) as pool:
+            results = list(pool.map(run_shard, shards, itertools.repeat(batch)))
+        stats = [None] * len(jobs)
+        for i, shard in enumerate(results):
+            stats[i::workers] = shard
+    configure({})
+    return stats
+
+
+def make_jobs(args):
+    paths = args.level or list(constants.LEVELS)
+    goal_x = args.goal_x if args.goal_x is not None else default_goal(paths[0])
+
+    scripts = []
+    for path in args.script:
+        with open(path) as f:
+            scripts.append((path, json.load(f)))
+    for seed in range(args.seed, args.seed + args.random):
+        scripts.append((f"random:{seed}", random_script(seed, args.seconds)))
+
+    return [
+        {
+            "config": overrides,
+            "levels": paths,
+            "name": name,
+            "script": script,
+            "goal_x": goal_x,
+            "max_ticks": int(args.seconds * FPS),
+        }
+        for overrides in parse_sweep(args.sweep)
+        for name, script in scripts
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="headless lockstep simulation")
+    parser.add_argument("--level", action="append", default=[])
+    parser.add_argument("--script", action="append", default=[])
+    parser.add_argument("--random", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--goal-x", type=float, default=None)
+    parser.add_argument("--sweep", action="append", default=[])
+    parser.add_argument("--batch", type=int, default=FPS)
+    parser.add_argument("--processes", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--benchmark", action="store_true")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args()
+
+    jobs = make_jobs(args)
+    if args.benchmark:
+        workers = os.cpu_count()
+        modes = [("1 process", 0, 0), (f"{workers} processes", workers, 0)]
+        if len(parse_sweep(args.sweep)) == 1:
+            modes.insert(1, (f"{workers} threads", 0, workers))
+    else:
+        modes = [("", args.processes, args.threads)]
+
+    first = None
+    for name, processes, threads in modes:
+        start = time.perf_counter()
+        stats = run(jobs, processes, threads, args.batch)
+        elapsed = time.perf_counter() - start
+        ticks = sum(result["ticks"] for result in stats)
+        print(
+            f"{len(jobs)} instances, {ticks} instance-ticks in {elapsed:.2f}s"
+            f"{' on ' + name if name else ''} ({ticks / elapsed:.0f} instance-ticks/s)"
+        )
+        if first is None:
+            first = stats
+        elif stats != first:
+            print(f"results on {name} differ from {modes[0][0]}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(first, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()